@@ -1,6 +1,6 @@
-import csv
 import os
 from datetime import datetime, timedelta
+from ledger import Ledger
 
 DATA_DIR = 'data'
 
@@ -23,26 +23,22 @@ goal_rows = [
     ['Emergency Fund', '100000', '25000', '2026-06-01'],
 ]
 
-def add_dummy_to_csv(filename, rows):
-    path = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(path):
-        print(f"{filename} not found, skipping.")
-        return
-    with open(path, 'r', newline='', encoding='utf-8') as f:
-        lines = list(csv.reader(f))
-    # Only add if only header is present
-    if len(lines) <= 1:
-        with open(path, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerows(rows)
-        print(f"Added dummy data to {filename}")
+def add_dummy_rows(ledger, table, rows, add_row):
+    # Only add if the table is empty
+    if ledger.count(table) == 0:
+        for row in rows:
+            add_row(*row)
+        print(f"Added dummy data to {table}")
     else:
-        print(f"{filename} already has data, skipping.")
+        print(f"{table} already has data, skipping.")
 
 def main():
-    add_dummy_to_csv('income.csv', income_rows)
-    add_dummy_to_csv('expenses.csv', expense_rows)
-    add_dummy_to_csv('goals.csv', goal_rows)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    ledger = Ledger(os.path.join(DATA_DIR, 'users.db'))
+    ledger.import_csv_files(DATA_DIR)
+    add_dummy_rows(ledger, 'income', income_rows, ledger.add_income)
+    add_dummy_rows(ledger, 'expenses', expense_rows, ledger.add_expense)
+    add_dummy_rows(ledger, 'goals', goal_rows, ledger.add_goal)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -1,18 +1,23 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, g, Response, stream_with_context, flash
 import os
+import math
+import json
 import csv
 import sqlite3
 from datetime import datetime
 from finance_env import FinanceEnv
 from q_learning_agent import QLearningAgent
-import pandas as pd
 from stock_analyzer import StockAnalyzer
-import shutil
+from ledger import Ledger, LEDGER_TABLES
+from snapshot import SnapshotService
+from instrumentation import metrics
 import time
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # Replace with a strong key in production
+metrics.init_app(app)  # Server-Timing headers and /metrics
 stock_analyzer = StockAnalyzer()
+MAX_BULK_SYMBOLS = 500  # Upper bound for /api/stocks watchlists
 
 # Ensure data folder and required files exist
 os.makedirs("data", exist_ok=True)
@@ -42,6 +47,21 @@ cursor.execute("""
 conn.commit()
 conn.close()
 
+# Expenses, income and goals are stored in indexed SQLite tables; the CSVs
+# are imported once on first start
+ledger = Ledger("data/users.db")
+ledger.import_csv_files("data")
+
+# Derived figures are computed once per ledger version and shared by all routes
+snapshot_service = SnapshotService(ledger)
+
+def get_snapshot():
+    """FinancialSnapshot for this request, read after any writes it made"""
+    if 'snapshot' not in g:
+        with metrics.stage("snapshot"):
+            g.snapshot = snapshot_service.get()
+    return g.snapshot
+
 # -------------------- ROUTES --------------------
 
 @app.route("/", methods=["GET", "POST"])
@@ -86,79 +106,12 @@ def dashboard():
     if 'username' not in session:
         return redirect(url_for("login"))
 
-    current_month = datetime.now().strftime("%Y-%m")
-    total_expense = 0
-    total_income = 0
-    total_savings = 0
-    investments = {"Stocks": 0, "Bonds": 0, "Real Estate": 0}
-    emergency_fund = 0
-    total_wealth = 0
-
-    # Calculate expenses
-    try:
-        with open("data/expenses.csv", "r") as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                category, amount, date = row
-                if date.startswith(current_month):
-                    total_expense += float(amount)
-    except FileNotFoundError:
-        pass
-
-    # Calculate income
-    try:
-        with open("data/income.csv", "r") as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                source, amount, date = row
-                if date.startswith(current_month):
-                    total_income += float(amount)
-    except FileNotFoundError:
-        pass
-
-    # Calculate savings and investments from goals (if tracked)
-    try:
-        with open("data/goals.csv", "r") as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if len(row) >= 4:
-                    goal, target, saved, deadline = row
-                    if "emergency" in goal.lower():
-                        emergency_fund += float(saved)
-                    elif "stock" in goal.lower():
-                        investments["Stocks"] += float(saved)
-                    elif "bond" in goal.lower():
-                        investments["Bonds"] += float(saved)
-                    elif "real estate" in goal.lower():
-                        investments["Real Estate"] += float(saved)
-                    else:
-                        total_savings += float(saved)
-    except FileNotFoundError:
-        pass
-
-    # Estimate total wealth
-    total_wealth = total_income - total_expense + total_savings + sum(investments.values()) + emergency_fund
-    savings = total_income - total_expense
-    ai_suggestion = round(total_income * 0.1)
+    snapshot = get_snapshot()
+    ai_suggestion = round(snapshot.monthly_income * 0.1)
 
     # ✅ RL integration (updated)
     try:
-        from rl_agent import get_rl_recommendation
-        rl_recommendation = get_rl_recommendation(
-            income=total_income,
-            expenses=total_expense,
-            savings=total_savings,
-            investments=investments,
-            emergency_fund=emergency_fund,
-            total_wealth=total_wealth
-        )
+        rl_recommendation = get_page_rl_recommendation()
     except Exception as e:
         rl_recommendation = {
             "budget_category": "N/A",
@@ -169,13 +122,21 @@ def dashboard():
 
     return render_template(
         "dashboard.html",
-        total_income=total_income,
-        total_expense=total_expense,
-        savings=savings,
+        total_income=snapshot.monthly_income,
+        total_expense=snapshot.monthly_expenses,
+        savings=snapshot.net_savings,
         ai_suggestion=ai_suggestion,
         rl_recommendation=rl_recommendation
     )
 
+def parse_amount(value):
+    """Form field as a finite float, or None if it is empty or not a number"""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) else None
+
 @app.route("/expenses", methods=["GET", "POST"])
 def expenses():
     if 'username' not in session:
@@ -185,28 +146,15 @@ def expenses():
         category = request.form.get("category")
         amount = request.form.get("amount")
         date = datetime.now().strftime("%Y-%m-%d")
-        if category and amount:
-            with open("data/expenses.csv", "a", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow([category, amount, date])
+        amount = parse_amount(amount)
+        if not category or amount is None:
+            flash("Enter a category and a numeric amount.")
+            return redirect(url_for("expenses"))
+        ledger.add_expense(category, amount, date)
 
-    expenses_list = []
-    total_monthly = 0
-    current_month = datetime.now().strftime("%Y-%m")
-
-    try:
-        with open("data/expenses.csv", "r") as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                category, amount, date = row
-                expenses_list.append([category, amount, date])
-                if date.startswith(current_month):
-                    total_monthly += float(amount)
-    except FileNotFoundError:
-        pass
+    with metrics.stage("ledger_query"):
+        expenses_list = ledger.get_expenses()
+    total_monthly = get_snapshot().monthly_expenses
 
     # RL recommendation for expenses
     rl_recommendation = get_page_rl_recommendation()
@@ -222,23 +170,14 @@ def income():
         source = request.form.get("source")
         amount = request.form.get("amount")
         date = datetime.now().strftime("%Y-%m-%d")
-        if source and amount:
-            with open("data/income.csv", "a", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow([source, amount, date])
+        amount = parse_amount(amount)
+        if not source or amount is None:
+            flash("Enter a source and a numeric amount.")
+            return redirect(url_for("income"))
+        ledger.add_income(source, amount, date)
 
-    income_list = []
-    try:
-        with open("data/income.csv", "r") as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                source, amount, date = row
-                income_list.append([source, amount, date])
-    except FileNotFoundError:
-        pass
+    with metrics.stage("ledger_query"):
+        income_list = ledger.get_income()
 
     # RL recommendation for income
     rl_recommendation = get_page_rl_recommendation()
@@ -253,23 +192,16 @@ def goals():
     if request.method == "POST":
         goal = request.form.get("goal")
         target = request.form.get("target")
-        saved = request.form.get("saved") or "0"
+        saved = parse_amount(request.form.get("saved") or "0")
         deadline = request.form.get("deadline")
-        if goal and target and deadline:
-            with open("data/goals.csv", "a", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow([goal, target, saved, deadline])
+        target = parse_amount(target)
+        if not goal or not deadline or target is None or saved is None:
+            flash("Enter a goal, a deadline and numeric target and saved amounts.")
+            return redirect(url_for("goals"))
+        ledger.add_goal(goal, target, saved, deadline)
 
-    goals_list = []
-    try:
-        with open("data/goals.csv", "r") as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if len(row) >= 4:
-                    goals_list.append(row)
-    except FileNotFoundError:
-        pass
+    with metrics.stage("ledger_query"):
+        goals_list = ledger.get_goals()
 
     # RL recommendation for savings
     rl_recommendation = get_page_rl_recommendation()
@@ -278,18 +210,15 @@ def goals():
 
 @app.route("/analysis")
 def analysis():
-    # Get financial data
-    income_data = pd.read_csv("data/income.csv")
-    expenses_data = pd.read_csv("data/expenses.csv")
-    goals_data = pd.read_csv("data/goals.csv")
-    
     # Calculate totals
-    total_income = income_data['Amount'].sum()
-    total_expenses = expenses_data['Amount'].sum()
+    snapshot = get_snapshot()
+    total_income = snapshot.lifetime_income
+    total_expenses = snapshot.lifetime_expenses
     total_savings = total_income - total_expenses
     
     # Get goals data
-    goals = goals_data.to_dict('records')
+    with metrics.stage("ledger_query"):
+        goals = ledger.get_goal_records()
     
     # Get RL recommendation
     rl_recommendation = get_rl_recommendation(total_income, total_expenses, total_savings)
@@ -301,6 +230,7 @@ def analysis():
                          goals=goals,
                          rl_recommendation=rl_recommendation)
 
+@metrics.timed("top_stocks")
 def get_top_stocks(income, expenses, savings):
     """Get personalized stock recommendations based on advanced financial analysis"""
     try:
@@ -619,7 +549,8 @@ def assess_investment_suitability(stock, investment_capacity):
     else:
         return 'moderate_fit'
 
-def get_portfolio_analysis(income, expenses, savings):
+@metrics.timed("portfolio_analysis")
+def get_portfolio_analysis(income, expenses, savings, recommended_stocks=None):
     """Get advanced portfolio analysis with personalized allocation strategy"""
     try:
         # Calculate financial health metrics
@@ -642,7 +573,8 @@ def get_portfolio_analysis(income, expenses, savings):
         }
         
         # Get personalized stock recommendations
-        recommended_stocks = get_top_stocks(income, expenses, savings)
+        if recommended_stocks is None:
+            recommended_stocks = get_top_stocks(income, expenses, savings)
         
         # Calculate optimal stock allocations
         stock_allocations = calculate_stock_allocations(amounts['stocks'], recommended_stocks, investment_capacity)
@@ -817,19 +749,21 @@ def stocks():
         
     try:
         # Get financial data
-        income = get_total_income()
-        expenses = get_total_expenses()
-        savings = get_total_savings()
+        snapshot = get_snapshot()
+        income, expenses, savings = snapshot.portfolio_inputs()
+        
+        # Get top 5 recommended stocks based on financial data
+        top_stocks = snapshot.memo("top_stocks", lambda: get_top_stocks(income, expenses, savings))
         
         # Get portfolio analysis
-        portfolio_analysis = get_portfolio_analysis(income, expenses, savings)
+        portfolio_analysis = snapshot.memo(
+            "portfolio_analysis",
+            lambda: get_portfolio_analysis(income, expenses, savings, recommended_stocks=top_stocks)
+        )
         
         # Get RL recommendation
         rl_recommendation = get_rl_recommendation(income, expenses, savings)
         
-        # Get top 5 recommended stocks based on financial data
-        top_stocks = get_top_stocks(income, expenses, savings)
-        
         # Get market status
         market_status = stock_analyzer.get_market_status()
         
@@ -872,7 +806,42 @@ def api_stock_analysis(symbol):
         
     try:
         analysis = stock_analyzer.analyze_stock(symbol)
-        return jsonify(analysis)
+        with metrics.stage("json"):
+            return jsonify(analysis)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stocks')
+def api_bulk_stock_analysis():
+    """Bulk analysis endpoint: /api/stocks?symbols=TCS,INFY,...
+
+    Streams one JSON object per line (NDJSON) in completion order.  With
+    mode=screen all symbols are scored in one vectorized pass and returned
+    together as a JSON list instead.
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+
+    symbols = [s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()]
+    if not symbols:
+        return jsonify({'error': 'No symbols given'}), 400
+    if len(symbols) > MAX_BULK_SYMBOLS:
+        return jsonify({'error': f'At most {MAX_BULK_SYMBOLS} symbols per request'}), 400
+    if request.args.get('mode') == 'screen':
+        return jsonify(stock_analyzer.screen(symbols))
+    include_history = request.args.get('history') == '1'
+
+    def generate():
+        for analysis in stock_analyzer.analyze_many(symbols, include_history=include_history):
+            yield json.dumps(analysis, default=float) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/stock-cache')
+def api_stock_cache_stats():
+    """API endpoint for stock data cache statistics"""
+    try:
+        return jsonify(stock_analyzer.cache_stats())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -885,33 +854,6 @@ def api_market_status():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def get_total_income():
-    """Calculate total income from income.csv"""
-    try:
-        income_df = pd.read_csv('data/income.csv')
-        return income_df['Amount'].sum()
-    except Exception as e:
-        print(f"Error reading income data: {e}")
-        return 0
-
-def get_total_expenses():
-    """Calculate total expenses from expenses.csv"""
-    try:
-        expenses_df = pd.read_csv('data/expenses.csv')
-        return expenses_df['Amount'].sum()
-    except Exception as e:
-        print(f"Error reading expenses data: {e}")
-        return 0
-
-def get_total_savings():
-    """Calculate total savings from goals.csv"""
-    try:
-        goals_df = pd.read_csv('data/goals.csv')
-        return goals_df['Saved'].sum()
-    except Exception as e:
-        print(f"Error reading savings data: {e}")
-        return 0
-
 @app.route("/contact")
 def contact():
     if 'username' not in session:
@@ -932,28 +874,22 @@ def clear_data():
     try:
         username = session['username']
         
-        # Clear all CSV files
-        csv_files = ['expenses.csv', 'income.csv', 'goals.csv']
+        # Back up every ledger table to CSV, then clear it
         cleared_files = []
+        timestamp = int(time.time())
+        
+        for table, (filename, headers, _) in LEDGER_TABLES.items():
+            backup_path = f"data/{filename}.backup_{timestamp}"
+            ledger.export_csv(table, backup_path)
+            
+            # Reset the legacy CSV too so it only holds headers
+            with open(f"data/{filename}", 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(headers)
+            
+            cleared_files.append(filename)
         
-        for filename in csv_files:
-            filepath = f"data/{filename}"
-            if os.path.exists(filepath):
-                # Create backup before clearing
-                backup_path = f"data/{filename}.backup_{int(time.time())}"
-                shutil.copy2(filepath, backup_path)
-                
-                # Clear the file but keep headers
-                with open(filepath, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    if filename == 'expenses.csv':
-                        writer.writerow(['Category', 'Amount', 'Date'])
-                    elif filename == 'income.csv':
-                        writer.writerow(['Source', 'Amount', 'Date'])
-                    elif filename == 'goals.csv':
-                        writer.writerow(['Goal', 'Target Amount', 'Saved Amount', 'Deadline'])
-                
-                cleared_files.append(filename)
+        ledger.clear()
         
         # Clear stock analyzer cache
         try:
@@ -981,66 +917,8 @@ def clear_data():
 from rl_agent import get_rl_recommendation
 
 def get_page_rl_recommendation():
-    # This logic mirrors the dashboard's state extraction
-    current_month = datetime.now().strftime("%Y-%m")
-    total_expense = 0
-    total_income = 0
-    total_savings = 0
-    investments = {"Stocks": 0, "Bonds": 0, "Real Estate": 0}
-    emergency_fund = 0
-    total_wealth = 0
-    try:
-        with open("data/expenses.csv", "r") as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                category, amount, date = row
-                if date.startswith(current_month):
-                    total_expense += float(amount)
-    except FileNotFoundError:
-        pass
-    try:
-        with open("data/income.csv", "r") as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if len(row) < 3:
-                    continue
-                source, amount, date = row
-                if date.startswith(current_month):
-                    total_income += float(amount)
-    except FileNotFoundError:
-        pass
-    try:
-        with open("data/goals.csv", "r") as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if len(row) >= 4:
-                    goal, target, saved, deadline = row
-                    if "emergency" in goal.lower():
-                        emergency_fund += float(saved)
-                    elif "stock" in goal.lower():
-                        investments["Stocks"] += float(saved)
-                    elif "bond" in goal.lower():
-                        investments["Bonds"] += float(saved)
-                    elif "real estate" in goal.lower():
-                        investments["Real Estate"] += float(saved)
-                    else:
-                        total_savings += float(saved)
-    except FileNotFoundError:
-        pass
-    total_wealth = total_income - total_expense + total_savings + sum(investments.values()) + emergency_fund
-    return get_rl_recommendation(
-        income=total_income,
-        expenses=total_expense,
-        savings=total_savings,
-        investments=investments,
-        emergency_fund=emergency_fund,
-        total_wealth=total_wealth
-    )
+    # Same state as the dashboard, taken from the shared snapshot
+    return get_rl_recommendation(**get_snapshot().rl_inputs())
 
 # -------------------- RUN --------------------
 if __name__ == "__main__":
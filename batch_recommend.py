@@ -0,0 +1,26 @@
+import argparse
+import pandas as pd
+from rl_agent import get_rl_recommendations_batch, BATCH_COLUMNS
+
+def main():
+    """Score every financial profile in a CSV with the trained RL agent"""
+    parser = argparse.ArgumentParser(description="Batch RL recommendations for many users")
+    parser.add_argument("input", help=f"CSV with columns {', '.join(BATCH_COLUMNS)}")
+    parser.add_argument("output", help="CSV to write the input rows plus recommendations to")
+    parser.add_argument("--chunksize", type=int, default=100000,
+                        help="Rows scored per batch (bounds memory for large files)")
+    args = parser.parse_args()
+
+    total = 0
+    header = True
+    for chunk in pd.read_csv(args.input, chunksize=args.chunksize):
+        recommendations = get_rl_recommendations_batch(chunk)
+        chunk.join(recommendations).to_csv(args.output, mode="w" if header else "a", header=header, index=False)
+        header = False
+        total += len(chunk)
+        print(f"Scored {total} profiles")
+
+    print(f"✅ Recommendations saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
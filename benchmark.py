@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import rl_agent
+from finance_env import FinanceEnv, VectorFinanceEnv
+from q_learning_agent import QLearningAgent, PrioritizedReplayBuffer
+from q_table import QTable, pack_state_keys
+
+# Each benchmark is a generator of cases: (params, unit, ops, setup) where
+# setup() does the untimed preparation and returns run(), which performs
+# `ops` units of work.  Cases are seeded identically before setup.
+BENCHMARKS = {}
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+def random_states(rng, n):
+    """Observations in the env's [0, 1] box"""
+    return rng.random((n, 8)).astype(np.float32)
+
+def random_transitions(rng, n, state_pool):
+    """n (state, action, reward, next_state, done) tuples drawn from a pool of states"""
+    states = state_pool[rng.integers(len(state_pool), size=n)]
+    next_states = state_pool[rng.integers(len(state_pool), size=n)]
+    actions = rng.integers(6, size=n)
+    rewards = rng.normal(size=n)
+    dones = rng.random(n) < 0.5
+    return [
+        (states[i], int(actions[i]), float(rewards[i]), next_states[i], bool(dones[i]))
+        for i in range(n)
+    ]
+
+@benchmark("env_step")
+def bench_env_step(config):
+    steps = config["steps"]
+
+    def single():
+        env = FinanceEnv()
+        env.reset()
+        actions = np.random.randint(env.action_space.n, size=steps)
+
+        def run():
+            for action in actions:
+                _, _, done, _ = env.step(action)
+                if done:
+                    env.reset()
+        return run
+    yield {"env": "FinanceEnv", "num_envs": 1}, "steps", steps, single
+
+    for num_envs in config["env_sizes"]:
+        iterations = max(1, steps // num_envs)
+
+        def vector(num_envs=num_envs, iterations=iterations):
+            env = VectorFinanceEnv(num_envs)
+            actions = np.random.randint(env.action_space.n, size=(iterations, num_envs))
+
+            def run():
+                for batch in actions:
+                    env.step(batch)
+            return run
+        yield {"env": "VectorFinanceEnv", "num_envs": num_envs}, "steps", iterations * num_envs, vector
+
+@benchmark("replay_sample")
+def bench_replay_sample(config):
+    for capacity in config["capacities"]:
+        for batch_size in config["batch_sizes"]:
+            draws = max(1, config["samples"] // batch_size)
+
+            def setup(capacity=capacity, batch_size=batch_size, draws=draws):
+                rng = np.random.default_rng(config["seed"])
+                buffer = PrioritizedReplayBuffer(capacity=capacity)
+                pool = random_states(rng, config["states"])
+                for experience in random_transitions(rng, capacity, pool):
+                    buffer.add(experience)
+                buffer.update_priorities(np.arange(capacity), rng.random(capacity))
+
+                def run():
+                    for _ in range(draws):
+                        buffer.sample(batch_size)
+                return run
+            yield {"capacity": capacity, "batch_size": batch_size}, "samples", draws * batch_size, setup
+
+@benchmark("replay_update")
+def bench_replay_update(config):
+    for batch_size in config["batch_sizes"]:
+        updates = max(1, config["samples"] // batch_size)
+
+        def setup(batch_size=batch_size, updates=updates):
+            rng = np.random.default_rng(config["seed"])
+            agent = QLearningAgent(FinanceEnv(), verbose=False)
+            agent.batch_size = batch_size
+            pool = random_states(rng, config["states"])
+            for experience in random_transitions(rng, agent.replay_buffer.capacity, pool):
+                agent.replay_buffer.add(experience)
+
+            def run():
+                for _ in range(updates):
+                    agent._update_from_replay()
+            return run
+        yield {"batch_size": batch_size, "states": config["states"]}, "samples", updates * batch_size, setup
+
+@benchmark("agent_learn")
+def bench_agent_learn(config):
+    steps = config["steps"]
+
+    def setup():
+        rng = np.random.default_rng(config["seed"])
+        agent = QLearningAgent(FinanceEnv(), verbose=False)
+        pool = random_states(rng, config["states"])
+        # Start with a full replay buffer so every step also replays a batch
+        for experience in random_transitions(rng, agent.replay_start_size, pool):
+            agent.replay_buffer.add(experience)
+        transitions = random_transitions(rng, steps, pool)
+
+        def run():
+            for state, _, reward, next_state, done in transitions:
+                action = agent.choose_action(state)
+                agent.learn(state, action, reward, next_state, done)
+        return run
+    yield {"batch_size": 32, "states": config["states"]}, "steps", steps, setup
+
+def synthetic_model(directory, n_states, seed, binary=False):
+    """Write a random Q-table of n_states states in the pickle or .qtb format"""
+    rng = np.random.default_rng(seed)
+    table = QTable(6)
+    keys = pack_state_keys((random_states(rng, n_states) * 100).astype(int))
+    rows = table.rows(keys)
+    table.values[rows] = rng.normal(size=(len(rows), 6))
+    path = os.path.join(directory, "best_q_table.pkl")
+    if binary:
+        table.save_binary(rl_agent.binary_model_path(path))
+    else:
+        with open(path, "wb") as f:
+            pickle.dump(table, f)
+    return path
+
+def _profiles(rng, n):
+    income = rng.uniform(0, 200000, n)
+    return pd.DataFrame({
+        "income": income,
+        "expenses": income * rng.uniform(0.2, 1.2, n),
+        "savings": rng.uniform(0, 100000, n),
+        "investments": rng.uniform(0, 200000, n),
+        "emergency_fund": rng.uniform(0, 150000, n),
+        "total_wealth": rng.uniform(0, 500000, n)
+    })
+
+@benchmark("recommend")
+def bench_recommend(config):
+    calls = config["recommendations"]
+    for n_states in config["table_sizes"]:
+        for binary in (False, True):
+            model_format = "qtb" if binary else "pkl"
+
+            def single(n_states=n_states, binary=binary):
+                directory = tempfile.mkdtemp(prefix="bench-model-")
+                rl_agent.model_registry = rl_agent.ModelRegistry(
+                    synthetic_model(directory, n_states, config["seed"], binary)
+                )
+                rng = np.random.default_rng(config["seed"])
+                profiles = _profiles(rng, calls).to_dict("records")
+                rl_agent.model_registry.get()  # load outside the timed region
+
+                def run():
+                    for p in profiles:
+                        rl_agent.get_rl_recommendation(
+                            p["income"], p["expenses"], p["savings"],
+                            investments={"Stocks": p["investments"]},
+                            emergency_fund=p["emergency_fund"], total_wealth=p["total_wealth"]
+                        )
+                return run
+            yield ({"mode": "single", "table_size": n_states, "format": model_format},
+                   "recommendations", calls, single)
+
+            def batch(n_states=n_states, binary=binary):
+                directory = tempfile.mkdtemp(prefix="bench-model-")
+                rl_agent.model_registry = rl_agent.ModelRegistry(
+                    synthetic_model(directory, n_states, config["seed"], binary)
+                )
+                profiles = _profiles(np.random.default_rng(config["seed"]), calls * 10)
+                rl_agent.model_registry.get()
+
+                def run():
+                    rl_agent.get_rl_recommendations_batch(profiles)
+                return run
+            yield ({"mode": "batch", "table_size": n_states, "format": model_format},
+                   "recommendations", calls * 10, batch)
+
+def seed_everything(seed):
+    np.random.seed(seed)
+    random.seed(seed)
+
+def run_case(name, params, unit, ops, setup, seed, repeat):
+    """Best-of-repeat throughput plus the traced peak memory of setup and one run"""
+    timings = []
+    for _ in range(repeat):
+        seed_everything(seed)
+        run = setup()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    seed_everything(seed)
+    tracemalloc.start()
+    try:
+        setup()()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "benchmark": name,
+        "params": params,
+        "unit": unit,
+        "ops": ops,
+        "seconds": best,
+        "seconds_all": timings,
+        "ops_per_sec": ops / best if best > 0 else float("inf"),
+        "peak_memory_bytes": peak
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def case_id(result):
+    params = ",".join(f"{k}={v}" for k, v in result["params"].items())
+    return f"{result['benchmark']}[{params}]"
+
+def compare(results, baseline_path):
+    """Print the throughput change of every case also present in the baseline"""
+    with open(baseline_path) as f:
+        baseline = {case_id(r): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        old = baseline.get(case_id(result))
+        if old is None:
+            continue
+        change = result["ops_per_sec"] / old["ops_per_sec"] - 1
+        print(f"  {case_id(result):70s} {change:+7.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmarks for the env, the agent and inference")
+    parser.add_argument("benchmarks", nargs="*",
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the best is reported")
+    parser.add_argument("--steps", type=int, default=20000, help="Env steps and learn steps per run")
+    parser.add_argument("--samples", type=int, default=100000, help="Replay samples per run")
+    parser.add_argument("--recommendations", type=int, default=2000, help="Single recommendations per run")
+    parser.add_argument("--states", type=int, default=5000, help="Distinct states in synthetic transitions")
+    parser.add_argument("--env-sizes", type=int, nargs="+", default=[64, 1024])
+    parser.add_argument("--capacities", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[32, 256])
+    parser.add_argument("--table-sizes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    config = {
+        "seed": args.seed,
+        "steps": args.steps,
+        "samples": args.samples,
+        "recommendations": args.recommendations,
+        "states": args.states,
+        "env_sizes": args.env_sizes,
+        "capacities": args.capacities,
+        "batch_sizes": args.batch_sizes,
+        "table_sizes": args.table_sizes
+    }
+
+    results = []
+    registry = rl_agent.model_registry
+    try:
+        for name in args.benchmarks or list(BENCHMARKS):
+            for params, unit, ops, setup in BENCHMARKS[name](config):
+                result = run_case(name, params, unit, ops, setup, args.seed, args.repeat)
+                results.append(result)
+                print(f"{case_id(result):70s} {result['ops_per_sec']:>14,.0f} {unit}/s "
+                      f"{result['peak_memory_bytes'] / 2**20:>9.1f} MiB peak")
+    finally:
+        rl_agent.model_registry = registry
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "config": config,
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+def atomic_pickle(obj, path):
+    """Pickle obj to path via a temporary file and a rename, so readers never see a partial file"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class CheckpointWriter:
+    """Writes checkpoints of a model on a background thread.
+
+    submit() only hands over a snapshot and returns; the writer thread
+    pickles it with atomic_pickle.  Only the latest submitted snapshot is
+    kept, so snapshots superseded before they were written are dropped, and
+    writes are at least min_interval seconds apart.  close() writes whatever
+    is still pending, so the final checkpoint is never lost.
+    """
+    def __init__(self, path, min_interval=5.0, write=atomic_pickle):
+        self.path = path
+        self.min_interval = min_interval
+        self.write = write
+        self._cond = threading.Condition()
+        self._pending = None
+        self._has_pending = False
+        self._writing = False
+        self._closed = False
+        self._flushing = 0
+        self._last_write = float("-inf")
+        self.error = None
+
+        self.submitted = 0
+        self.writes = 0
+        self.superseded = 0
+        self.write_seconds = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=f"checkpoint-{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot):
+        """Queue snapshot for writing, replacing any snapshot not yet written"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("CheckpointWriter is closed")
+            if self._has_pending:
+                self.superseded += 1
+            self._pending = snapshot
+            self._has_pending = True
+            self.submitted += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._has_pending:
+                        wait = self._last_write + self.min_interval - time.monotonic()
+                        if wait <= 0 or self._closed or self._flushing:
+                            break
+                        self._cond.wait(wait)
+                    elif self._closed:
+                        return
+                    else:
+                        self._cond.wait()
+                snapshot = self._pending
+                self._pending = None
+                self._has_pending = False
+                self._writing = True
+
+            started = time.monotonic()
+            written = False
+            try:
+                self.write(snapshot, self.path)
+                written = True
+            except Exception as e:
+                # Keep training going; the error is reported by flush()/close()
+                self.error = e
+            finally:
+                finished = time.monotonic()
+                with self._cond:
+                    self._writing = False
+                    self._last_write = finished
+                    self.writes += written
+                    self.write_seconds += finished - started
+                    self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Write the pending snapshot now (ignoring min_interval) and wait for it"""
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                done = self._cond.wait_for(lambda: not self._has_pending and not self._writing, timeout)
+            finally:
+                self._flushing -= 1
+        if self.error is not None:
+            raise self.error
+        return done
+
+    def close(self, timeout=None):
+        """Write any pending snapshot and stop the writer thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "writes": self.writes,
+                "superseded": self.superseded,
+                "write_seconds": self.write_seconds,
+                "pending": self._has_pending
+            }
@@ -0,0 +1,35 @@
+import argparse
+import pickle
+from q_table import QTable, FrozenQTable
+from rl_agent import binary_model_path
+
+def convert(pkl_path, output_path=None, n_actions=6):
+    """Convert a pickled Q-table (QTable or legacy dict) to the .qtb format"""
+    # Only convert pickles you trust: unpickling can run arbitrary code
+    with open(pkl_path, "rb") as f:
+        q_table = pickle.load(f)
+    if isinstance(q_table, dict):
+        q_table = QTable.from_dict(q_table, n_actions)
+    output_path = output_path or binary_model_path(pkl_path)
+    q_table.save_binary(output_path)
+
+    # Read it back to make sure every state survived the conversion
+    frozen = FrozenQTable(output_path)
+    if len(frozen) != len(q_table):
+        raise RuntimeError(f"{output_path} has {len(frozen)} states, expected {len(q_table)}")
+    return output_path, len(frozen)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pickled Q-tables to memory-mappable .qtb files")
+    parser.add_argument("models", nargs="+", help="Pickled models, e.g. model/best_q_table.pkl")
+    parser.add_argument("--output", help="Output path (only with a single model; default: same name, .qtb)")
+    args = parser.parse_args()
+    if args.output and len(args.models) > 1:
+        parser.error("--output needs exactly one model")
+
+    for path in args.models:
+        output_path, states = convert(path, args.output)
+        print(f"✅ {path} -> {output_path} ({states} states)")
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@ import gym
 from gym import spaces
 
 class FinanceEnv(gym.Env):
+    # Assets that can be held, in the order of self.holdings
+    investment_names = ["Stocks", "Bonds", "Real Estate"]
+
     def __init__(self):
         super(FinanceEnv, self).__init__()
         
@@ -56,24 +59,45 @@ class FinanceEnv(gym.Env):
             dtype=np.float32
         )
 
+        # Asset parameters as lists in holdings order, so a step indexes
+        # them instead of searching investment_opportunities by name
+        opportunities = {opp["name"]: opp for opp in self.investment_opportunities}
+        self.asset_risk = [opportunities[name]["risk"] for name in self.investment_names]
+        self.asset_return = [opportunities[name]["return"] for name in self.investment_names]
+        # Investing actions -> holding they add to, the holding below which
+        # investing more earns the full bonus, and that bonus
+        self.action_asset = {1: 0, 2: 1, 3: 2}
+        self.asset_limit = [self.income * 0.4, self.income * 0.3, self.income * 0.2]
+        self.asset_bonus = [1.5, 1.2, 1.3]
+        # Emergency fund reward per fund level; the fund only moves in fixed steps
+        self._emergency_rewards = {}
+
         self.reset()
 
     def reset(self):
         self.expenses = 0
         self.savings = 0
-        self.investments = {
-            "Stocks": 0,
-            "Bonds": 0,
-            "Real Estate": 0
-        }
+        self.holdings = [0] * len(self.investment_names)
         self.emergency_fund = 0
         self.monthly_income = self.income
         self.total_wealth = self.income
         self.risk_score = 0.5
+
+        # Running totals, updated by step() instead of re-summed
+        self.total_investments = 0
+        self.total_allocated = 0  # expenses + savings + investments + emergency fund
+        self.diversification = 0
+        self.expected_return = 0.0
+        self._update_emergency_reward()
         return self._get_state()
 
+    @property
+    def investments(self):
+        """Holdings by asset name (a copy; step() updates self.holdings)"""
+        return dict(zip(self.investment_names, self.holdings))
+
     def _get_state(self):
-        total_investments = sum(self.investments.values())
+        total_investments = self.total_investments
         return np.array([
             self.expenses / self.max_expense,
             self.savings / self.income,
@@ -82,59 +106,63 @@ class FinanceEnv(gym.Env):
             self.monthly_income / self.income,
             self.risk_score,
             self.total_wealth / (self.income * 12),  # Wealth to annual income ratio
-            sum(self.investments.values()) / (self.total_wealth + 1e-6)  # Investment ratio
+            total_investments / (self.total_wealth + 1e-6)  # Investment ratio
         ], dtype=np.float32)
 
-    def _calculate_risk_score(self):
-        """Calculate portfolio risk score based on investments"""
+    def _update_portfolio(self):
+        """Recompute risk score, diversification and expected return of the holdings.
+
+        The arithmetic (including sum() vs. accumulating loops) is kept as in
+        the original per-step recomputation so rewards stay bit-identical.
+        """
+        total = self.total_investments
         risk_score = 0
-        total_invested = sum(self.investments.values())
-        if total_invested > 0:
-            for inv_type, amount in self.investments.items():
-                weight = amount / total_invested
-                for opp in self.investment_opportunities:
-                    if opp["name"] == inv_type:
-                        risk_score += weight * opp["risk"]
-        return risk_score
+        self.diversification = 0
+        if total > 0:
+            weights = [amount / total for amount in self.holdings]
+            for weight, risk in zip(weights, self.asset_risk):
+                risk_score += weight * risk
+            self.diversification = 1 - sum([weight**2 for weight in weights])
+        self.risk_score = risk_score
+        self.expected_return = sum(
+            [amount * ret for amount, ret in zip(self.holdings, self.asset_return)]
+        ) / (total + 1e-6)
+
+    def _update_emergency_reward(self):
+        # Emergency fund reward with diminishing returns; only changes with the fund
+        reward = self._emergency_rewards.get(self.emergency_fund)
+        if reward is None:
+            emergency_ratio = self.emergency_fund / self.emergency_fund_target
+            reward = self._emergency_rewards[self.emergency_fund] = 2 * (1 - np.exp(-emergency_ratio))
+        self.emergency_reward = reward
 
     def _calculate_reward(self, action):
         base_reward = 0
         
         # Emergency fund reward with diminishing returns
-        emergency_ratio = self.emergency_fund / self.emergency_fund_target
-        base_reward += 2 * (1 - np.exp(-emergency_ratio))
+        base_reward += self.emergency_reward
         
         # Portfolio diversification reward
-        total_investments = sum(self.investments.values())
-        if total_investments > 0:
-            diversification = 1 - sum((v/total_investments)**2 for v in self.investments.values())
-            base_reward += diversification * 2
+        if self.total_investments > 0:
+            base_reward += self.diversification * 2
         
         # Risk-adjusted return reward
-        risk_score = self._calculate_risk_score()
-        expected_return = sum(
-            self.investments[inv["name"]] * inv["return"] 
-            for inv in self.investment_opportunities 
-            if inv["name"] in self.investments
-        ) / (total_investments + 1e-6)
-        
-        risk_adjusted_return = expected_return / (risk_score + 1e-6)
+        risk_score = self.risk_score
+        risk_adjusted_return = self.expected_return / (risk_score + 1e-6)
         base_reward += risk_adjusted_return * 3
         
         # Action-specific rewards with more sophisticated logic
         if action == 0:  # Save
             base_reward += 1 if self.savings < self.income * 0.3 else 0.5
-        elif action == 1:  # Invest Stocks
-            base_reward += 1.5 if self.investments["Stocks"] < self.income * 0.4 else 0.5
-        elif action == 2:  # Invest Bonds
-            base_reward += 1.2 if self.investments["Bonds"] < self.income * 0.3 else 0.5
-        elif action == 3:  # Invest Real Estate
-            base_reward += 1.3 if self.investments["Real Estate"] < self.income * 0.2 else 0.5
         elif action == 4:  # Spend
             expense_ratio = self.expenses / self.income
             base_reward += 0.5 if expense_ratio < 0.5 else -1
         elif action == 5:  # Emergency fund
             base_reward += 2 if self.emergency_fund < self.emergency_fund_target else 0.5
+        else:  # Invest
+            asset = self.action_asset.get(action)
+            if asset is not None:
+                base_reward += self.asset_bonus[asset] if self.holdings[asset] < self.asset_limit[asset] else 0.5
             
         # Penalize excessive risk
         if risk_score > 0.7:
@@ -144,38 +172,218 @@ class FinanceEnv(gym.Env):
 
     def step(self, action):
         amount = 10000  # Base amount for actions
+        if isinstance(action, np.integer):
+            action = int(action)  # compares and hashes much faster below
 
         if action == 0:  # Save
             self.savings += amount
-        elif action == 1:  # Invest Stocks
-            self.investments["Stocks"] += amount
-        elif action == 2:  # Invest Bonds
-            self.investments["Bonds"] += amount
-        elif action == 3:  # Invest Real Estate
-            self.investments["Real Estate"] += amount
         elif action == 4:  # Spend
             self.expenses += amount
         elif action == 5:  # Emergency fund
             self.emergency_fund += amount
+            self._update_emergency_reward()
+        else:  # Invest
+            asset = self.action_asset.get(action)
+            if asset is None:
+                amount = 0
+            else:
+                self.holdings[asset] += amount
+                self.total_investments += amount
+        self.total_allocated += amount
 
         # Update total wealth
         self.total_wealth = (
             self.savings + 
-            sum(self.investments.values()) + 
+            self.total_investments + 
             self.emergency_fund - 
             self.expenses
         )
         
         # Update risk score
-        self.risk_score = self._calculate_risk_score()
+        self._update_portfolio()
         
         reward = self._calculate_reward(action)
         
         # Episode ends if total allocations exceed income or if wealth drops too low
         done = (
-            (self.expenses + self.savings + sum(self.investments.values()) + self.emergency_fund >= self.income) or
+            (self.total_allocated >= self.income) or
             (self.total_wealth < self.income * 0.5)  # Bankruptcy condition
         )
         
         return self._get_state(), reward, done, {}
 
+
+
+class VectorFinanceEnv:
+    """Batch of independent FinanceEnv households stepped with NumPy arrays.
+
+    All per-household state lives in arrays of shape (num_envs, ...), so one
+    call to step() advances every household at once.  Rewards, observations
+    and done flags match num_envs separate FinanceEnv instances exactly.
+    Households that finish an episode are reset automatically; their final
+    observation is returned in info["final_observation"].
+    """
+
+    # Column order of self.investments, matching FinanceEnv.holdings
+    investment_names = FinanceEnv.investment_names
+
+    def __init__(self, num_envs):
+        self.num_envs = num_envs
+
+        # Share parameters with the single-household environment
+        template = FinanceEnv()
+        self.income = template.income
+        self.max_expense = template.max_expense
+        self.emergency_fund_target = template.emergency_fund_target
+        self.inflation_rate = template.inflation_rate
+        self.tax_rate = template.tax_rate
+        self.investment_opportunities = template.investment_opportunities
+        self.action_space = template.action_space
+        self.single_observation_space = template.observation_space
+        self.observation_space = spaces.Box(
+            low=0,
+            high=1,
+            shape=(num_envs,) + template.observation_space.shape,
+            dtype=np.float32
+        )
+
+        self.asset_risk = np.array(template.asset_risk)
+        self.asset_return = np.array(template.asset_return)
+
+        self.reset()
+
+    def reset(self):
+        n = self.num_envs
+        self.expenses = np.zeros(n)
+        self.savings = np.zeros(n)
+        self.investments = np.zeros((n, len(self.investment_names)))
+        self.emergency_fund = np.zeros(n)
+        self.monthly_income = np.full(n, float(self.income))
+        self.total_wealth = np.full(n, float(self.income))
+        self.risk_score = np.full(n, 0.5)
+        return self._get_state()
+
+    def _reset_done(self, done):
+        self.expenses[done] = 0
+        self.savings[done] = 0
+        self.investments[done] = 0
+        self.emergency_fund[done] = 0
+        self.monthly_income[done] = self.income
+        self.total_wealth[done] = self.income
+        self.risk_score[done] = 0.5
+
+    def _total_investments(self):
+        # Summed column by column to keep FinanceEnv's addition order
+        return self.investments[:, 0] + self.investments[:, 1] + self.investments[:, 2]
+
+    def _get_state(self):
+        total_investments = self._total_investments()
+        return np.stack([
+            self.expenses / self.max_expense,
+            self.savings / self.income,
+            total_investments / self.income,
+            self.emergency_fund / self.emergency_fund_target,
+            self.monthly_income / self.income,
+            self.risk_score,
+            self.total_wealth / (self.income * 12),
+            total_investments / (self.total_wealth + 1e-6)
+        ], axis=1).astype(np.float32)
+
+    def _calculate_risk_score(self, total_invested):
+        """Vectorized FinanceEnv._calculate_risk_score"""
+        invested = total_invested > 0
+        safe_total = np.where(invested, total_invested, 1)
+        risk_score = np.zeros(self.num_envs)
+        for col in range(len(self.investment_names)):
+            weight = self.investments[:, col] / safe_total
+            risk_score = risk_score + weight * self.asset_risk[col]
+        return np.where(invested, risk_score, 0.0)
+
+    def _calculate_reward(self, actions, total_investments):
+        """Vectorized FinanceEnv._calculate_reward"""
+        base_reward = np.zeros(self.num_envs)
+
+        # Emergency fund reward with diminishing returns
+        emergency_ratio = self.emergency_fund / self.emergency_fund_target
+        base_reward += 2 * (1 - np.exp(-emergency_ratio))
+
+        # Portfolio diversification reward
+        invested = total_investments > 0
+        safe_total = np.where(invested, total_investments, 1)
+        weights = self.investments / safe_total[:, None]
+        diversification = 1 - (weights[:, 0] ** 2 + weights[:, 1] ** 2 + weights[:, 2] ** 2)
+        base_reward += np.where(invested, diversification * 2, 0.0)
+
+        # Risk-adjusted return reward
+        risk_score = self.risk_score
+        weighted_return = (
+            self.investments[:, 0] * self.asset_return[0] +
+            self.investments[:, 1] * self.asset_return[1] +
+            self.investments[:, 2] * self.asset_return[2]
+        )
+        expected_return = weighted_return / (total_investments + 1e-6)
+        risk_adjusted_return = expected_return / (risk_score + 1e-6)
+        base_reward += risk_adjusted_return * 3
+
+        # Action-specific rewards
+        action_reward = np.select(
+            [
+                actions == 0,
+                actions == 1,
+                actions == 2,
+                actions == 3,
+                actions == 4,
+                actions == 5
+            ],
+            [
+                np.where(self.savings < self.income * 0.3, 1.0, 0.5),
+                np.where(self.investments[:, 0] < self.income * 0.4, 1.5, 0.5),
+                np.where(self.investments[:, 1] < self.income * 0.3, 1.2, 0.5),
+                np.where(self.investments[:, 2] < self.income * 0.2, 1.3, 0.5),
+                np.where(self.expenses / self.income < 0.5, 0.5, -1.0),
+                np.where(self.emergency_fund < self.emergency_fund_target, 2.0, 0.5)
+            ],
+            default=0.0
+        )
+        base_reward += action_reward
+
+        # Penalize excessive risk
+        base_reward -= np.where(risk_score > 0.7, 1.0, 0.0)
+
+        return base_reward
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        amount = 10000  # Base amount for actions
+
+        self.savings += np.where(actions == 0, amount, 0)
+        self.investments[:, 0] += np.where(actions == 1, amount, 0)
+        self.investments[:, 1] += np.where(actions == 2, amount, 0)
+        self.investments[:, 2] += np.where(actions == 3, amount, 0)
+        self.expenses += np.where(actions == 4, amount, 0)
+        self.emergency_fund += np.where(actions == 5, amount, 0)
+
+        total_investments = self._total_investments()
+        self.total_wealth = (
+            self.savings +
+            total_investments +
+            self.emergency_fund -
+            self.expenses
+        )
+        self.risk_score = self._calculate_risk_score(total_investments)
+
+        rewards = self._calculate_reward(actions, total_investments)
+
+        dones = (
+            (self.expenses + self.savings + total_investments + self.emergency_fund >= self.income) |
+            (self.total_wealth < self.income * 0.5)
+        )
+
+        states = self._get_state()
+        info = {}
+        if dones.any():
+            info["final_observation"] = states.copy()
+            self._reset_done(dones)
+            states[dones] = self._get_state()[dones]
+
+        return states, rewards, dones, info
@@ -0,0 +1,290 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# Metric columns produced by compute_panel_metrics, as in StockAnalyzer.calculate_metrics
+METRIC_COLUMNS = [
+    'daily_returns', 'volatility', 'sma_20', 'sma_50', 'rsi', 'macd', 'macd_signal',
+    'current_price', 'price_change', 'price_change_pct', 'avg_volume', 'current_volume', 'volume_ratio'
+]
+
+def build_panel(histories):
+    """Align {symbol: history DataFrame} into wide close and volume panels (dates x symbols)"""
+    close = pd.concat({symbol: data['Close'] for symbol, data in histories.items()}, axis=1).sort_index()
+    volume = pd.concat(
+        {symbol: data['Volume'] for symbol, data in histories.items() if 'Volume' in data.columns}, axis=1
+    ).reindex(index=close.index, columns=close.columns)
+    return close, volume
+
+def _ema(values, span):
+    """EMA down the rows (pandas ewm(span, adjust=False)), starting at each column's first value"""
+    alpha = 2.0 / (span + 1)
+    out = np.empty_like(values)
+    ema = np.full(values.shape[1], np.nan)
+    for t in range(len(values)):
+        x = values[t]
+        ema = np.where(np.isnan(ema), x, (1 - alpha) * ema + alpha * x)
+        out[t] = ema
+    return out
+
+def _window_mean(values, window):
+    """Mean of the last `window` rows of each column"""
+    return values[-window:].mean(axis=0)
+
+def compute_panel_metrics(close, volume=None):
+    """Compute calculate_metrics' indicators for every column of a price panel at once.
+
+    close (and the optional volume) are DataFrames indexed by date with one
+    column per symbol.  Missing closes after a symbol's first bar are forward
+    filled.  Returns a DataFrame indexed by symbol with METRIC_COLUMNS; like
+    calculate_metrics, symbols with fewer than 20 bars are left out.
+    """
+    close = close.sort_index().ffill()
+    counts = close.notna().sum().to_numpy()
+    keep = counts >= 20
+    close = close.loc[:, keep]
+    counts = counts[keep]
+    symbols = close.columns
+    prices = close.to_numpy(dtype=np.float64)
+
+    metrics = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Returns
+        returns = prices[1:] / prices[:-1] - 1
+        metrics['daily_returns'] = np.nanmean(returns, axis=0)
+        metrics['volatility'] = np.nanstd(returns, axis=0, ddof=1)
+
+        # Moving averages
+        metrics['sma_20'] = _window_mean(prices, 20)
+        sma_50 = _window_mean(prices, 50) if len(prices) >= 50 else np.full(len(symbols), np.nan)
+        metrics['sma_50'] = np.where(counts >= 50, sma_50, np.nanmean(prices, axis=0))
+
+        # RSI (14-bar simple averages of gains and losses)
+        delta = np.diff(prices, axis=0)
+        gain = _window_mean(np.where(delta > 0, delta, 0), 14)
+        loss = _window_mean(np.where(delta < 0, -delta, 0), 14)
+        rsi = 100 - (100 / (1 + gain / loss))
+        metrics['rsi'] = np.where(np.isnan(rsi), 50, rsi)
+
+        # MACD
+        macd = _ema(prices, 12) - _ema(prices, 26)
+        metrics['macd'] = macd[-1]
+        metrics['macd_signal'] = _ema(macd, 9)[-1]
+
+        # Price change
+        metrics['current_price'] = prices[-1]
+        metrics['price_change'] = prices[-1] - prices[-2]
+        metrics['price_change_pct'] = metrics['price_change'] / prices[-2] * 100
+
+        # Volume analysis
+        if volume is not None:
+            volumes = volume.reindex(index=close.index, columns=symbols).to_numpy(dtype=np.float64)
+            avg_volume = np.nanmean(volumes, axis=0)
+            current_volume = volumes[-1]
+            metrics['avg_volume'] = avg_volume
+            metrics['current_volume'] = current_volume
+            metrics['volume_ratio'] = np.where(avg_volume > 0, current_volume / avg_volume, 1)
+
+    return pd.DataFrame(metrics, index=symbols)
+
+class IncrementalIndicators:
+    """Streaming version of calculate_metrics for one symbol, updated per bar.
+
+    Keeps only bounded windows (the last 50 closes, 14 gains/losses, and the
+    returns and volumes of the last `window` bars) plus running sums and EMA
+    state, so each update costs O(1).  Feeding a bar with the same date as
+    the previous one replaces it, which handles intraday revisions of the
+    current day's bar.  to_state()/from_state() give a JSON-able checkpoint.
+    """
+    SMA_SHORT = 20
+    SMA_LONG = 50
+    RSI_PERIOD = 14
+    EMA_FAST, EMA_SLOW, EMA_SIGNAL = 12, 26, 9
+
+    def __init__(self, window=None):
+        self.window = window
+        self.closes = deque(maxlen=self.SMA_LONG)
+        self.gains = deque(maxlen=self.RSI_PERIOD)
+        self.losses = deque(maxlen=self.RSI_PERIOD)
+        self.returns = deque(maxlen=window - 1 if window else None)
+        self.volumes = deque(maxlen=window)
+        self.return_sum = 0.0
+        self.return_sq_sum = 0.0
+        self.volume_sum = 0.0
+        self.ema_fast = None
+        self.ema_slow = None
+        self.signal = None
+        self.count = 0
+        self.last_date = None
+        self._undo = None
+        self._updates_since_resync = 0
+        self._metrics = None
+
+    @classmethod
+    def from_history(cls, data, window=None):
+        """Warm up from a history DataFrame (Close and optional Volume columns)"""
+        tracker = cls(window=window if window is not None else len(data))
+        volumes = data['Volume'] if 'Volume' in data.columns else pd.Series(0.0, index=data.index)
+        dates = pd.DatetimeIndex(data.index).strftime('%Y-%m-%d')
+        for date, close, volume in zip(dates, data['Close'], volumes):
+            tracker.update(close, volume, date)
+        return tracker
+
+    @staticmethod
+    def _ema_step(previous, value, span):
+        if previous is None:
+            return value
+        alpha = 2.0 / (span + 1)
+        return (1 - alpha) * previous + alpha * value
+
+    @staticmethod
+    def _push(window, value):
+        """Append to a bounded deque, returning the value it pushed out (or None)"""
+        evicted = window[0] if window.maxlen is not None and len(window) == window.maxlen else None
+        window.append(value)
+        return evicted
+
+    def update(self, close, volume=0.0, date=None):
+        """Add a bar; a bar with the same date as the last one replaces it.
+
+        Returns False if the bar repeats the last one unchanged.
+        """
+        close, volume = float(close), float(volume)
+        if date is not None and date == self.last_date and self._undo is not None:
+            if close == self.closes[-1] and volume == self.volumes[-1]:
+                return False
+            self._rollback()
+
+        undo = {
+            'scalars': (self.return_sum, self.return_sq_sum, self.volume_sum,
+                        self.ema_fast, self.ema_slow, self.signal, self.count, self.last_date),
+            'has_previous': len(self.closes) > 0
+        }
+        if self.closes:
+            delta = close - self.closes[-1]
+            ret = close / self.closes[-1] - 1
+            undo['gain'] = self._push(self.gains, delta if delta > 0 else 0.0)
+            undo['loss'] = self._push(self.losses, -delta if delta < 0 else 0.0)
+            evicted = self._push(self.returns, ret)
+            undo['return'] = evicted
+            self.return_sum += ret
+            self.return_sq_sum += ret * ret
+            if evicted is not None:
+                self.return_sum -= evicted
+                self.return_sq_sum -= evicted * evicted
+        undo['close'] = self._push(self.closes, close)
+        evicted = self._push(self.volumes, volume)
+        undo['volume'] = evicted
+        self.volume_sum += volume - (evicted or 0.0)
+
+        self.ema_fast = self._ema_step(self.ema_fast, close, self.EMA_FAST)
+        self.ema_slow = self._ema_step(self.ema_slow, close, self.EMA_SLOW)
+        self.signal = self._ema_step(self.signal, self.ema_fast - self.ema_slow, self.EMA_SIGNAL)
+        self.count += 1
+        self.last_date = date
+        self._undo = undo
+
+        # Re-sum the windows now and then so running sums do not drift
+        self._updates_since_resync += 1
+        if self.window and self._updates_since_resync >= self.window:
+            self._resync()
+        self._metrics = None
+        return True
+
+    def _rollback(self):
+        """Undo the most recent update (only one level is kept)"""
+        undo = self._undo
+        (self.return_sum, self.return_sq_sum, self.volume_sum,
+         self.ema_fast, self.ema_slow, self.signal, self.count, self.last_date) = undo['scalars']
+        self._pop(self.closes, undo['close'])
+        self._pop(self.volumes, undo['volume'])
+        if undo['has_previous']:
+            self._pop(self.gains, undo['gain'])
+            self._pop(self.losses, undo['loss'])
+            self._pop(self.returns, undo['return'])
+        self._undo = None
+        self._metrics = None
+
+    @staticmethod
+    def _pop(window, evicted):
+        window.pop()
+        if evicted is not None:
+            window.appendleft(evicted)
+
+    def _resync(self):
+        self.return_sum = float(sum(self.returns))
+        self.return_sq_sum = float(sum(r * r for r in self.returns))
+        self.volume_sum = float(sum(self.volumes))
+        self._updates_since_resync = 0
+
+    def metrics(self):
+        """Same dict as StockAnalyzer.calculate_metrics, or None with under 20 bars"""
+        if self._metrics is None:
+            self._metrics = self._compute_metrics()
+        # A copy, so callers cannot alter the memoized result
+        return dict(self._metrics) if self._metrics is not None else None
+
+    def _compute_metrics(self):
+        if self.count < self.SMA_SHORT or not self.returns:
+            return None
+
+        n = len(self.returns)
+        mean = self.return_sum / n
+        variance = (self.return_sq_sum - n * mean * mean) / (n - 1) if n > 1 else float('nan')
+        closes = list(self.closes)
+
+        gain = sum(self.gains) / self.RSI_PERIOD
+        loss = sum(self.losses) / self.RSI_PERIOD
+        if loss > 0:
+            rsi = 100 - (100 / (1 + gain / loss))
+        else:
+            rsi = 100.0 if gain > 0 else 50.0
+
+        metrics = {
+            'daily_returns': mean,
+            'volatility': float(np.sqrt(max(variance, 0.0))),
+            'sma_20': sum(closes[-self.SMA_SHORT:]) / self.SMA_SHORT,
+            'sma_50': sum(closes) / len(closes),
+            'rsi': rsi,
+            'macd': self.ema_fast - self.ema_slow,
+            'macd_signal': self.signal,
+            'current_price': closes[-1],
+            'price_change': closes[-1] - closes[-2],
+        }
+        metrics['price_change_pct'] = metrics['price_change'] / closes[-2] * 100
+        metrics['avg_volume'] = self.volume_sum / len(self.volumes)
+        metrics['current_volume'] = self.volumes[-1]
+        metrics['volume_ratio'] = (
+            metrics['current_volume'] / metrics['avg_volume'] if metrics['avg_volume'] > 0 else 1
+        )
+        return metrics
+
+    def to_state(self):
+        """JSON-serializable checkpoint of the tracker"""
+        state = {name: getattr(self, name) for name in (
+            'window', 'return_sum', 'return_sq_sum', 'volume_sum',
+            'ema_fast', 'ema_slow', 'signal', 'count', 'last_date', '_updates_since_resync'
+        )}
+        for name in ('closes', 'gains', 'losses', 'returns', 'volumes'):
+            state[name] = list(getattr(self, name))
+        state['undo'] = self._undo
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        tracker = cls(window=state['window'])
+        for name in ('closes', 'gains', 'losses', 'returns', 'volumes'):
+            getattr(tracker, name).extend(state[name])
+        for name in ('return_sum', 'return_sq_sum', 'volume_sum', 'ema_fast', 'ema_slow',
+                     'signal', 'count', 'last_date', '_updates_since_resync'):
+            setattr(tracker, name, state[name])
+        undo = state.get('undo')
+        if undo is not None:
+            undo = dict(undo, scalars=tuple(undo['scalars']))
+        tracker._undo = undo
+        return tracker
+
+    def approx_bytes(self):
+        """Rough memory footprint, for cache accounting"""
+        values = len(self.closes) + len(self.gains) + len(self.losses) + len(self.returns) + len(self.volumes)
+        return 512 + 32 * values
@@ -1,4 +1,5 @@
 import sqlite3
+from ledger import Ledger
 
 conn = sqlite3.connect("data/users.db")
 cursor = conn.cursor()
@@ -13,3 +14,7 @@ CREATE TABLE IF NOT EXISTS users (
 
 conn.commit()
 conn.close()
+
+# Expense, income and goal tables (imports the CSV ledgers on first run)
+ledger = Ledger("data/users.db")
+ledger.import_csv_files("data")
@@ -0,0 +1,227 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+
+# Upper bounds (seconds) of the histogram buckets, as in the Prometheus client defaults
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stages timed during the current request, for the Server-Timing header
+_request_stages = contextvars.ContextVar("request_stages", default=None)
+
+class Histogram:
+    """Counts of observed durations per bucket, plus their sum and count"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class _NullStage:
+    """Stand-in returned by stage() while instrumentation is disabled"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+class Instrumentation:
+    """Per-stage timing histograms for request handling.
+
+    Wrap work in `with metrics.stage("name"):` or decorate a function with
+    @metrics.timed("name").  Durations go into one histogram per stage and,
+    inside a Flask request, into that response's Server-Timing header (see
+    init_app).  While disabled, stage() returns a shared no-op context
+    manager and timed() calls straight through, so leaving the hooks in
+    place costs next to nothing.
+
+    Server-Timing only covers stages timed on the request's own thread
+    before the view returns.  Stages run in worker threads (analyze_many)
+    or while a streamed body is being sent still go into the histograms,
+    but not into the header, and streamed responses get no header at all.
+    """
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS, prefix="finadviser"):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._requests = {}
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def timed(self, name):
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def observe(self, name, seconds):
+        """Record one duration of a stage"""
+        with self._lock:
+            histogram = self._stages.get(name)
+            if histogram is None:
+                histogram = self._stages[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    def observe_request(self, endpoint, status, seconds):
+        with self._lock:
+            key = (endpoint, status)
+            histogram = self._requests.get(key)
+            if histogram is None:
+                histogram = self._requests[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._requests.clear()
+
+    def stats(self):
+        """{stage: {count, sum, mean}} of everything recorded so far"""
+        with self._lock:
+            return {
+                name: {"count": h.count, "sum": h.sum, "mean": h.sum / h.count if h.count else 0.0}
+                for name, h in self._stages.items()
+            }
+
+    def _histogram_lines(self, metric, labelled):
+        lines = []
+        for labels, histogram in labelled:
+            label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], histogram.counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f'{metric}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{label_text}}} {histogram.sum!r}")
+            lines.append(f"{metric}_count{{{label_text}}} {histogram.count}")
+        return lines
+
+    def render_prometheus(self):
+        """All histograms in the Prometheus text exposition format"""
+        with self._lock:
+            stages = sorted(self._stages.items())
+            requests = sorted(self._requests.items())
+
+        stage_metric = f"{self.prefix}_stage_duration_seconds"
+        request_metric = f"{self.prefix}_request_duration_seconds"
+        lines = [
+            f"# HELP {stage_metric} Time spent in each request-handling stage.",
+            f"# TYPE {stage_metric} histogram"
+        ]
+        lines += self._histogram_lines(stage_metric, [((("stage", name),), h) for name, h in stages])
+        lines += [
+            f"# HELP {request_metric} Total time to handle a request, by endpoint and status.",
+            f"# TYPE {request_metric} histogram"
+        ]
+        lines += self._histogram_lines(
+            request_metric,
+            [((("endpoint", endpoint), ("status", str(status))), h) for (endpoint, status), h in requests]
+        )
+        return "\n".join(lines) + "\n"
+
+    def init_app(self, app, metrics_path="/metrics"):
+        """Time every request of a Flask app, add Server-Timing headers and serve metrics_path.
+
+        metrics_path only answers requests from localhost unless the app
+        config sets METRICS_ALLOW_REMOTE (or FINADVISER_METRICS_ALLOW_REMOTE=1).
+        """
+        from flask import Response, abort, g, request, template_rendered, before_render_template
+
+        app.config.setdefault(
+            "METRICS_ALLOW_REMOTE", os.environ.get("FINADVISER_METRICS_ALLOW_REMOTE", "0") == "1"
+        )
+
+        @app.before_request
+        def _start_request_timing():
+            if self.enabled:
+                request.environ["instrumentation.start"] = time.perf_counter()
+                request.environ["instrumentation.token"] = _request_stages.set({})
+
+        @app.after_request
+        def _finish_request_timing(response):
+            start = request.environ.pop("instrumentation.start", None)
+            token = request.environ.pop("instrumentation.token", None)
+            if start is None:
+                return response
+            total = time.perf_counter() - start
+            stages = _request_stages.get() or {}
+            _request_stages.reset(token)
+            self.observe_request(request.endpoint or "unknown", response.status_code, total)
+            # A streamed body has not been produced yet, so its timings would be misleading
+            if not response.is_streamed:
+                timings = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items()]
+                timings.append(f"total;dur={total * 1000:.2f}")
+                response.headers["Server-Timing"] = ", ".join(timings)
+            return response
+
+        # Template rendering is timed through Flask's signals; the start time
+        # lives on g, since the context is handed to the template
+        def _before_render(sender, template, context, **extra):
+            if self.enabled:
+                g._instrumentation_render_start = time.perf_counter()
+
+        def _rendered(sender, template, context, **extra):
+            start = g.pop("_instrumentation_render_start", None)
+            if start is not None:
+                self.observe("render", time.perf_counter() - start)
+
+        before_render_template.connect(_before_render, app, weak=False)
+        template_rendered.connect(_rendered, app, weak=False)
+
+        def metrics_endpoint():
+            if not app.config["METRICS_ALLOW_REMOTE"] and request.remote_addr not in ("127.0.0.1", "::1"):
+                abort(403)
+            return Response(self.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+        app.add_url_rule(metrics_path, "metrics", metrics_endpoint)
+        return app
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Shared instance; set FINADVISER_INSTRUMENTATION=0 to turn timing off
+metrics = Instrumentation(enabled=os.environ.get("FINADVISER_INSTRUMENTATION", "1") != "0")
@@ -0,0 +1,310 @@
+import csv
+import os
+import sqlite3
+from contextlib import contextmanager
+
+# CSV file name, header and SQLite columns for each ledger table
+LEDGER_TABLES = {
+    "expenses": ("expenses.csv", ["Category", "Amount", "Date"], ["category", "amount", "date"]),
+    "income": ("income.csv", ["Source", "Amount", "Date"], ["source", "amount", "date"]),
+    "goals": ("goals.csv", ["Goal", "Target Amount", "Saved Amount", "Deadline"], ["goal", "target", "saved", "deadline"])
+}
+
+# Buckets the savings goals are grouped into, by keyword in the goal name
+GOAL_BUCKETS = ["Emergency Fund", "Stocks", "Bonds", "Real Estate", "Savings"]
+
+def goal_bucket(goal):
+    """Classify a goal by name: emergency fund, an investment type, or plain savings"""
+    name = goal.lower()
+    if "emergency" in name:
+        return "Emergency Fund"
+    elif "stock" in name:
+        return "Stocks"
+    elif "bond" in name:
+        return "Bonds"
+    elif "real estate" in name:
+        return "Real Estate"
+    return "Savings"
+
+def format_amount(amount):
+    """Render a stored amount the way it was entered (no trailing .0)"""
+    return str(int(amount)) if float(amount).is_integer() else str(amount)
+
+class Ledger:
+    """SQLite storage for expenses, income and savings goals.
+
+    Transactions are indexed by date and category.  Running sums per month
+    and per category are kept in ledger_totals and updated in the same
+    transaction as every insert, so totals are single primary-key lookups
+    no matter how long the history is.  The tables live in the same
+    database as the users table.
+    """
+    def __init__(self, db_path="data/users.db"):
+        self.db_path = db_path
+        self.init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def init_db(self):
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS expenses (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    category TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    date TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date, amount);
+                CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses (category, date);
+
+                CREATE TABLE IF NOT EXISTS income (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    date TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_income_date ON income (date, amount);
+                CREATE INDEX IF NOT EXISTS idx_income_source ON income (source, date);
+
+                CREATE TABLE IF NOT EXISTS goals (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    goal TEXT NOT NULL,
+                    target REAL NOT NULL,
+                    saved REAL NOT NULL,
+                    deadline TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS ledger_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+
+                -- period is a 'YYYY-MM' month or '' for all time; category
+                -- is a category/source/goal bucket or '' for the period total
+                CREATE TABLE IF NOT EXISTS ledger_totals (
+                    kind TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    total REAL NOT NULL,
+                    PRIMARY KEY (kind, period, category)
+                ) WITHOUT ROWID;
+            """)
+            built = conn.execute("SELECT value FROM ledger_meta WHERE key = 'totals_built'").fetchone()
+            if not built:
+                # Databases created before ledger_totals existed
+                self._rebuild_totals(conn)
+                conn.execute("INSERT INTO ledger_meta (key, value) VALUES ('totals_built', '1')")
+
+    # -------------------- VERSIONING --------------------
+
+    def _bump_version(self, conn):
+        conn.execute(
+            """INSERT INTO ledger_meta (key, value) VALUES ('version', '1')
+               ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"""
+        )
+
+    def get_version(self):
+        """Counter bumped by every write; cheap way to tell if cached figures are stale"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM ledger_meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    # -------------------- AGGREGATES --------------------
+
+    def _add_to_totals(self, conn, kind, period, category, amount):
+        """Add amount to the running sums for (period, category) and their rollups"""
+        keys = {(period, category), (period, ""), ("", category), ("", "")}
+        conn.executemany(
+            """INSERT INTO ledger_totals (kind, period, category, total) VALUES (?, ?, ?, ?)
+               ON CONFLICT (kind, period, category) DO UPDATE SET total = total + excluded.total""",
+            [(kind, p, c, amount) for p, c in keys]
+        )
+
+    def _rebuild_totals(self, conn):
+        """Recompute ledger_totals from the transaction tables"""
+        conn.execute("DELETE FROM ledger_totals")
+        for table, category_column in (("expenses", "category"), ("income", "source")):
+            rows = conn.execute(
+                f"SELECT substr(date, 1, 7), {category_column}, SUM(amount) FROM {table} GROUP BY 1, 2"
+            ).fetchall()
+            for month, category, amount in rows:
+                self._add_to_totals(conn, table, month, category, amount)
+        for goal, saved in conn.execute("SELECT goal, saved FROM goals").fetchall():
+            self._add_to_totals(conn, "goals", "", goal_bucket(goal), saved)
+
+    def rebuild_totals(self):
+        with self._connect() as conn:
+            self._rebuild_totals(conn)
+            self._bump_version(conn)
+
+    # -------------------- WRITES --------------------
+
+    def add_expense(self, category, amount, date):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO expenses (category, amount, date) VALUES (?, ?, ?)",
+                         (category, float(amount), date))
+            self._add_to_totals(conn, "expenses", date[:7], category, float(amount))
+            self._bump_version(conn)
+
+    def add_income(self, source, amount, date):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO income (source, amount, date) VALUES (?, ?, ?)",
+                         (source, float(amount), date))
+            self._add_to_totals(conn, "income", date[:7], source, float(amount))
+            self._bump_version(conn)
+
+    def add_goal(self, goal, target, saved, deadline):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO goals (goal, target, saved, deadline) VALUES (?, ?, ?, ?)",
+                         (goal, float(target), float(saved), deadline))
+            self._add_to_totals(conn, "goals", "", goal_bucket(goal), float(saved))
+            self._bump_version(conn)
+
+    def clear(self):
+        """Delete every expense, income and goal row"""
+        with self._connect() as conn:
+            for table in LEDGER_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+            self._rebuild_totals(conn)
+            self._bump_version(conn)
+
+    # -------------------- READS --------------------
+
+    def get_expenses(self):
+        """All expenses as [category, amount, date] rows, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT category, amount, date FROM expenses ORDER BY id").fetchall()
+        return [[category, format_amount(amount), date] for category, amount, date in rows]
+
+    def get_income(self):
+        """All income as [source, amount, date] rows, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT source, amount, date FROM income ORDER BY id").fetchall()
+        return [[source, format_amount(amount), date] for source, amount, date in rows]
+
+    def get_goals(self):
+        """All goals as [goal, target, saved, deadline] rows"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT goal, target, saved, deadline FROM goals ORDER BY id").fetchall()
+        return [[goal, format_amount(target), format_amount(saved), deadline]
+                for goal, target, saved, deadline in rows]
+
+    def get_goal_records(self):
+        """All goals as dicts with goal, target, saved and deadline keys"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT goal, target, saved, deadline FROM goals ORDER BY id").fetchall()
+        return [{"goal": goal, "target": target, "saved": saved, "deadline": deadline}
+                for goal, target, saved, deadline in rows]
+
+    def _get_totals(self, kind, period):
+        """{category: total} for one kind and period; '' holds the grand total"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT category, total FROM ledger_totals WHERE kind = ? AND period = ?",
+                (kind, period)
+            ).fetchall()
+        return dict(rows)
+
+    def _get_total(self, kind, period):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT total FROM ledger_totals WHERE kind = ? AND period = ? AND category = ''",
+                (kind, period)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_monthly_total(self, table, month):
+        """Sum of expenses or income dated within a 'YYYY-MM' month"""
+        return self._get_total(table, month)
+
+    def get_category_totals(self, table, month=""):
+        """{category: total} of expenses or income for a month ('' for all time)"""
+        totals = self._get_totals(table, month)
+        totals.pop("", None)
+        return totals
+
+    def get_total(self, table):
+        """Sum of all expenses or income ever recorded"""
+        return self._get_total(table, "")
+
+    def get_total_saved(self):
+        """Sum of the saved amounts of all goals"""
+        return self._get_total("goals", "")
+
+    def get_goal_totals(self):
+        """Saved amounts summed per goal bucket (see GOAL_BUCKETS)"""
+        totals = self._get_totals("goals", "")
+        return {bucket: totals.get(bucket, 0) for bucket in GOAL_BUCKETS}
+
+    def count(self, table):
+        with self._connect() as conn:
+            (n,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        return n
+
+    # -------------------- CSV IMPORT / EXPORT --------------------
+
+    def import_csv_files(self, data_dir="data"):
+        """Import the legacy CSV ledgers once.
+
+        Rows are loaded the first time this runs against a database; later
+        calls are no-ops, so the CSVs are not imported twice.  Returns the
+        number of rows imported.
+        """
+        with self._connect() as conn:
+            done = conn.execute("SELECT value FROM ledger_meta WHERE key = 'csv_imported'").fetchone()
+            if done:
+                return 0
+
+            imported = 0
+            for table, (filename, _, columns) in LEDGER_TABLES.items():
+                path = os.path.join(data_dir, filename)
+                if not os.path.exists(path):
+                    continue
+                rows = []
+                with open(path, "r", newline="") as f:
+                    reader = csv.reader(f)
+                    next(reader, None)
+                    for row in reader:
+                        if len(row) < len(columns):
+                            continue
+                        row = row[:len(columns)]
+                        try:
+                            if table == "goals":
+                                row[1], row[2] = float(row[1]), float(row[2])
+                            else:
+                                row[1] = float(row[1])
+                        except ValueError:
+                            continue
+                        rows.append(row)
+                placeholders = ", ".join("?" * len(columns))
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+                )
+                imported += len(rows)
+
+            self._rebuild_totals(conn)
+            self._bump_version(conn)
+            conn.execute("INSERT INTO ledger_meta (key, value) VALUES ('csv_imported', '1')")
+        return imported
+
+    def export_csv(self, table, path):
+        """Write one ledger table to a CSV file with the legacy header"""
+        _, header, columns = LEDGER_TABLES[table]
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id").fetchall()
+        amount_columns = [i for i, column in enumerate(columns) if column in ("amount", "target", "saved")]
+        rows = [
+            [format_amount(value) if i in amount_columns else value for i, value in enumerate(row)]
+            for row in rows
+        ]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from ledger import Ledger, GOAL_BUCKETS
+from price_store import PriceStore
+
+EXPENSE_CATEGORIES = [
+    "Rent", "Groceries", "Utilities", "Transport", "Fuel", "Dining Out", "Entertainment", "Shopping",
+    "Healthcare", "Insurance", "Education", "Travel", "Subscriptions", "Phone", "Internet",
+    "Gym", "Gifts", "Charity", "Household", "Personal Care", "Pets", "Childcare", "Taxes", "Repairs"
+]
+INCOME_SOURCES = ["Salary", "Bonus", "Freelance", "Dividends", "Interest", "Rental Income", "Refunds"]
+STOCK_SYMBOLS = ["RELIANCE", "TCS", "HDFCBANK", "INFY", "ICICIBANK", "BAJFINANCE", "BHARTIARTL", "ITC"]
+DEFAULT_ROUTES = [
+    "/dashboard", "/expenses", "/income", "/savings", "/analysis", "/stocks",
+    "/api/stock/TCS", "/api/stocks?symbols=" + ",".join(STOCK_SYMBOLS),
+    "/api/stocks?mode=screen&symbols=" + ",".join(STOCK_SYMBOLS)
+]
+
+def category_names(base, count):
+    """count category names: the realistic ones first, then numbered extras"""
+    names = list(base[:count])
+    names += [f"{base[i % len(base)]} {i // len(base) + 1}" for i in range(len(names), count)]
+    return names
+
+def random_dates(rng, n, years, end):
+    """n 'YYYY-MM-DD' strings spread uniformly over the last `years` years"""
+    end = np.datetime64(pd.Timestamp(end).strftime("%Y-%m-%d"), "D")
+    offsets = rng.integers(0, int(365.25 * years), size=n)
+    return (end - offsets).astype(str)
+
+def generate_ledger(db_path, transactions, years=3, categories=60, goals=20, income_share=0.1,
+                    seed=0, chunk_size=200000, end=None):
+    """Fill a ledger database with synthetic expenses, income and goals.
+
+    Rows are generated with NumPy and inserted with executemany in chunks,
+    inside one transaction with journaling relaxed, so millions of rows take
+    seconds to minutes.  Totals are rebuilt at the end and the CSV import is
+    marked done so the app does not import the empty CSVs over it.
+    """
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now()
+    ledger = Ledger(db_path)
+
+    n_income = int(transactions * income_share)
+    plan = [
+        ("expenses", "category", transactions - n_income,
+         category_names(EXPENSE_CATEGORIES, categories), (5, 5000)),
+        ("income", "source", n_income,
+         category_names(INCOME_SOURCES, max(3, categories // 8)), (1000, 150000))
+    ]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        with conn:
+            for table, column, count, names, (low, high) in plan:
+                names = np.array(names, dtype=object)
+                for start in range(0, count, chunk_size):
+                    size = min(chunk_size, count - start)
+                    # Log-uniform amounts: many small transactions, a few large ones
+                    amounts = np.round(np.exp(rng.uniform(np.log(low), np.log(high), size)), 2)
+                    rows = zip(
+                        names[rng.integers(len(names), size=size)].tolist(),
+                        amounts.tolist(),
+                        random_dates(rng, size, years, end).tolist()
+                    )
+                    conn.executemany(f"INSERT INTO {table} ({column}, amount, date) VALUES (?, ?, ?)", rows)
+
+            # Goal deadlines fall within the next three years
+            today = np.datetime64(pd.Timestamp(end).strftime("%Y-%m-%d"), "D")
+            goal_rows = []
+            for i in range(goals):
+                bucket = GOAL_BUCKETS[i % len(GOAL_BUCKETS)]
+                target = float(rng.integers(10, 500)) * 1000
+                goal_rows.append((f"{bucket} goal {i + 1}", target, round(target * rng.random(), 2),
+                                  str(today + rng.integers(30, 3 * 365))))
+            conn.executemany("INSERT INTO goals (goal, target, saved, deadline) VALUES (?, ?, ?, ?)", goal_rows)
+            conn.execute("INSERT OR REPLACE INTO ledger_meta (key, value) VALUES ('csv_imported', '1')")
+    finally:
+        conn.close()
+
+    ledger.rebuild_totals()
+    return ledger
+
+def seed_prices(db_path, symbols=STOCK_SYMBOLS, days=400, seed=0):
+    """Random-walk daily bars for each symbol, ending today"""
+    rng = np.random.default_rng(seed)
+    store = PriceStore(db_path)
+    dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=days)
+    for symbol in symbols:
+        close = rng.uniform(100, 3000) * np.cumprod(1 + rng.normal(0.0005, 0.015, days))
+        store.save_history(f"{symbol}.NS", pd.DataFrame({
+            "Open": close * (1 + rng.normal(0, 0.005, days)),
+            "High": close * 1.01,
+            "Low": close * 0.99,
+            "Close": close,
+            "Volume": rng.integers(100000, 5000000, days).astype(float)
+        }, index=dates))
+    return store
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+def drive_route(app, route, requests, concurrency, warmup=1):
+    """Send `requests` GETs to route from `concurrency` logged-in clients"""
+    def client():
+        c = app.test_client()
+        with c.session_transaction() as sess:
+            sess["username"] = "loadtest"
+        return c
+
+    for _ in range(warmup):
+        response = client().get(route)
+        response.get_data()
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        c = client()
+        local, failed = [], 0
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            start = time.perf_counter()
+            try:
+                response = c.get(route)
+                response.get_data()  # drain streamed responses
+                failed += response.status_code >= 400
+            except Exception:
+                failed += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "route": route,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "concurrency": concurrency,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "mean_ms": float(np.mean(ms)) if ms else float("nan"),
+        "throughput_rps": len(latencies) / elapsed if elapsed > 0 else float("inf")
+    }
+
+def load_app():
+    """Import the Flask app from the current directory with an offline stock source"""
+    import app as app_module
+    from stock_analyzer import StockAnalyzer
+    app_module.stock_analyzer = StockAnalyzer(price_store=PriceStore("data/prices.db"), offline=True)
+    return app_module.app
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Flask routes against a synthetic ledger")
+    parser.add_argument("--transactions", type=int, default=100000, help="Expense + income rows (10k to 10M)")
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--categories", type=int, default=60)
+    parser.add_argument("--goals", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--routes", nargs="+", default=DEFAULT_ROUTES)
+    parser.add_argument("--model", help="Trained model (.pkl or .qtb) to serve RL recommendations from "
+                                        "(default: a synthetic one)")
+    parser.add_argument("--workdir", help="Directory for the generated data (default: a temporary one)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary work directory")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    start_dir = os.getcwd()
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="finadviser-loadtest-"))
+    data_dir = os.path.join(workdir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    model_dir = os.path.join(workdir, "model")
+    os.makedirs(model_dir, exist_ok=True)
+    if args.model:
+        model_name = "best_q_table.qtb" if args.model.endswith(".qtb") else "best_q_table.pkl"
+        shutil.copy(args.model, os.path.join(model_dir, model_name))
+    else:
+        # The pages that show RL advice fail to render without a model
+        from benchmark import synthetic_model
+        synthetic_model(model_dir, n_states=1000, seed=args.seed, binary=False)
+
+    started = time.perf_counter()
+    print(f"🛠  Generating {args.transactions:,} transactions in {data_dir}")
+    generate_ledger(os.path.join(data_dir, "users.db"), args.transactions, years=args.years,
+                    categories=args.categories, goals=args.goals, seed=args.seed)
+    seed_prices(os.path.join(data_dir, "prices.db"), seed=args.seed)
+    print(f"   done in {time.perf_counter() - started:.1f}s")
+
+    # The app resolves data/ and model/ relative to the working directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    try:
+        app = load_app()
+        results = []
+        print(f"{'route':60s} {'reqs':>5s} {'err':>4s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'req/s':>8s}")
+        for route in args.routes:
+            result = drive_route(app, route, args.requests, args.concurrency)
+            # Latencies of error pages say nothing about the route
+            result["failed"] = result["requests"] > 0 and result["errors"] == result["requests"]
+            results.append(result)
+            if result["failed"]:
+                print(f"{route[:60]:60s} {result['requests']:5d} {result['errors']:4d}   ❌ every request failed")
+                continue
+            print(f"{route[:60]:60s} {result['requests']:5d} {result['errors']:4d} "
+                  f"{result['p50_ms']:9.1f} {result['p95_ms']:9.1f} {result['p99_ms']:9.1f} "
+                  f"{result['throughput_rps']:8.1f}")
+    finally:
+        os.chdir(start_dir)
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "config": {k: v for k, v in vars(args).items() if k != "output"},
+                "results": results
+            }, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+    failed = [result["route"] for result in results if result["failed"]]
+    if failed:
+        sys.exit(f"❌ Every request failed on: {', '.join(failed)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+# Coverage start recorded for a 'max' download: everything there is
+EARLIEST_DATE = pd.Timestamp("1900-01-01")
+
+def period_start(period, now=None):
+    """First date covered by a yfinance-style period such as '5d', '6mo' or '1y'"""
+    now = (pd.Timestamp.now() if now is None else pd.Timestamp(now)).normalize()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1)
+    for suffix, unit in (("mo", "months"), ("y", "years"), ("d", "days"), ("wk", "weeks")):
+        if period.endswith(suffix):
+            return now - pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+    raise ValueError(f"Unsupported period: {period}")
+
+class PriceStore:
+    """Daily OHLCV history kept on disk and shared by every worker process.
+
+    Bars are stored in SQLite, one row per (symbol, date), so a refresh only
+    has to fetch the bars after the last stored one.  The store can be seeded
+    from CSV files (the format written by DataFrame.to_csv on a yfinance
+    history) to run the analyzer without network access.
+    """
+    def __init__(self, db_path="data/prices.db"):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS bars (
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL,
+                    high REAL,
+                    low REAL,
+                    close REAL,
+                    volume REAL,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID;
+
+                CREATE TABLE IF NOT EXISTS symbols (
+                    symbol TEXT PRIMARY KEY,
+                    last_fetched REAL,
+                    covered_from TEXT
+                );
+
+                CREATE TABLE IF NOT EXISTS indicator_state (
+                    key TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at REAL
+                );
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(symbols)")]
+            if "covered_from" not in columns:  # stores created before coverage was tracked
+                conn.execute("ALTER TABLE symbols ADD COLUMN covered_from TEXT")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_history(self, symbol, start=None):
+        """Stored bars for symbol from start (inclusive) as a yfinance-like DataFrame"""
+        query = "SELECT date, open, high, low, close, volume FROM bars WHERE symbol = ?"
+        params = [symbol]
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        query += " ORDER BY date"
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        data = pd.DataFrame(rows, columns=["Date"] + PRICE_COLUMNS)
+        data.index = pd.DatetimeIndex(pd.to_datetime(data.pop("Date")), name="Date")
+        return data
+
+    def date_range(self, symbol):
+        """(first, last) stored dates for symbol, or (None, None)"""
+        with self._connect() as conn:
+            first, last = conn.execute(
+                "SELECT MIN(date), MAX(date) FROM bars WHERE symbol = ?", (symbol,)
+            ).fetchone()
+        if first is None:
+            return None, None
+        return pd.Timestamp(first), pd.Timestamp(last)
+
+    def save_history(self, symbol, data):
+        """Insert or overwrite the bars in data (indexed by date)"""
+        if data is None or data.empty:
+            return 0
+        dates = pd.DatetimeIndex(data.index).strftime("%Y-%m-%d")
+        columns = [data[c] if c in data.columns else pd.Series(None, index=data.index) for c in PRICE_COLUMNS]
+        rows = [
+            (symbol, date, *(None if pd.isna(v) else float(v) for v in values))
+            for date, *values in zip(dates, *columns)
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                """INSERT OR REPLACE INTO bars (symbol, date, open, high, low, close, volume)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+        return len(rows)
+
+    def last_fetched(self, symbol):
+        """time.time() of the last successful network refresh of symbol, or 0"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT last_fetched FROM symbols WHERE symbol = ?", (symbol,)).fetchone()
+        return row[0] if row else 0
+
+    def covered_from(self, symbol):
+        """Date from which the stored history of symbol is known to be complete, or None.
+
+        Set when a whole period was downloaded, so a symbol listed after the
+        period start still counts as covered.  Falls back to the first stored
+        bar for histories that were imported rather than fetched.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT covered_from FROM symbols WHERE symbol = ?", (symbol,)).fetchone()
+        if row and row[0]:
+            return pd.Timestamp(row[0])
+        return self.date_range(symbol)[0]
+
+    def mark_fetched(self, symbol, fetched_at=None, covered_from=None):
+        """Record a network refresh; covered_from is the start of a full-period download"""
+        covered = pd.Timestamp(covered_from).strftime("%Y-%m-%d") if covered_from is not None else None
+        with self._connect() as conn:
+            conn.execute(
+                """INSERT INTO symbols (symbol, last_fetched, covered_from) VALUES (?, ?, ?)
+                   ON CONFLICT(symbol) DO UPDATE SET
+                       last_fetched = excluded.last_fetched,
+                       covered_from = CASE
+                           WHEN excluded.covered_from IS NULL THEN covered_from
+                           WHEN covered_from IS NULL OR excluded.covered_from < covered_from
+                               THEN excluded.covered_from
+                           ELSE covered_from
+                       END""",
+                (symbol, fetched_at if fetched_at is not None else time.time(), covered)
+            )
+
+    def load_indicator_state(self, key):
+        """Checkpointed IncrementalIndicators state saved under key, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT state FROM indicator_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_indicator_state(self, key, state):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO indicator_state (key, state, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(state), time.time())
+            )
+
+    def import_csv(self, symbol, path):
+        """Seed the store with one symbol's history from a CSV file"""
+        data = pd.read_csv(path, index_col=0)
+        # Keep the exchange-local trading date, dropping any UTC offset
+        data.index = pd.to_datetime(data.index.astype(str).str[:10])
+        return self.save_history(symbol, data)
+
+    def import_directory(self, directory):
+        """Seed the store from SYMBOL.csv files; returns {symbol: bars imported}"""
+        imported = {}
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".csv"):
+                symbol = filename[:-len(".csv")]
+                imported[symbol] = self.import_csv(symbol, os.path.join(directory, filename))
+        return imported
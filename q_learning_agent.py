@@ -1,50 +1,181 @@
+import os
+import time
 import numpy as np
-import pickle
-from collections import deque
 import random
 from finance_env import FinanceEnv
+from q_table import QTable, pack_state_key, pack_state_keys
+from checkpoint import CheckpointWriter, atomic_pickle
+from telemetry import TelemetryWriter
+
+class SumTree:
+    """Binary tree of priorities where each node holds the sum of its children.
+
+    Leaves are stored in the second half of a flat array, so updates and
+    prefix-sum lookups touch one node per level: O(log n).
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.leaf_count = 1
+        while self.leaf_count < capacity:
+            self.leaf_count *= 2
+        self.depth = self.leaf_count.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaf_count)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indices):
+        return self.tree[np.asarray(indices) + self.leaf_count]
+
+    def update(self, indices, values):
+        """Set leaf values and recompute the sums above them"""
+        nodes = np.asarray(indices) + self.leaf_count
+        if nodes.size == 0:
+            return
+        self.tree[nodes] = values
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = np.unique(nodes // 2)
+
+    def find(self, values):
+        """Return the leaf index holding each prefix sum in values"""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            go_right = values >= left_sum
+            values -= np.where(go_right, left_sum, 0)
+            nodes = left + go_right
+        return nodes - self.leaf_count
 
 class PrioritizedReplayBuffer:
-    def __init__(self, capacity=10000, alpha=0.6, beta=0.4):
+    """Prioritized experience replay stored as a structure of arrays.
+
+    Transitions live in preallocated columns (states, actions, rewards,
+    next_states, dones) rather than one tuple of objects per slot, so a
+    transition costs a few dozen bytes.  With quantize=True observations
+    are kept as int16 hundredths, trunc(state * 100), which is exactly the
+    precision get_state_key discretizes to; sample() dequantizes them to
+    values that discretize back to the same keys.  Values beyond +-327.67
+    saturate.
+    """
+    QUANTIZE_SCALE = 100
+
+    def __init__(self, capacity=10000, alpha=0.6, beta=0.4, state_dim=8, quantize=False):
         self.capacity = capacity
         self.alpha = alpha  # Priority exponent
         self.beta = beta    # Importance sampling exponent
-        self.buffer = deque(maxlen=capacity)
-        self.priorities = deque(maxlen=capacity)
+        self.quantize = quantize
+        # Preallocated ring buffer; the sum tree holds priority ** alpha per slot
+        state_dtype = np.int16 if quantize else np.float32
+        self.states = np.zeros((capacity, state_dim), dtype=state_dtype)
+        self.next_states = np.zeros((capacity, state_dim), dtype=state_dtype)
+        self.actions = np.zeros(capacity, dtype=np.int16)
+        self.rewards = np.zeros(capacity, dtype=np.float32)  # Q-values are float32 too
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.tree = SumTree(capacity)
+        self.position = 0
+        self.size = 0
         self.max_priority = 1.0
 
+    def __len__(self):
+        return self.size
+
+    def nbytes(self):
+        """Memory held by the transition columns and the sum tree"""
+        columns = (self.states, self.next_states, self.actions, self.rewards, self.dones, self.tree.tree)
+        return sum(column.nbytes for column in columns)
+
+    def _encode(self, states):
+        if not self.quantize:
+            return states
+        # Same arithmetic (and dtype) as get_state_key, so keys are preserved
+        q = np.trunc(np.asarray(states) * self.QUANTIZE_SCALE)
+        return np.clip(q, np.iinfo(np.int16).min, np.iinfo(np.int16).max)
+
+    def _decode(self, states):
+        if not self.quantize:
+            return states
+        # Mid-point of each bucket, away from zero, truncates back to the stored value
+        return ((states + 0.5 * np.sign(states)) / self.QUANTIZE_SCALE).astype(np.float32)
+
     def add(self, experience, error=None):
+        state, action, reward, next_state, done = experience
         priority = self.max_priority if error is None else min(error + 1e-5, self.max_priority)
-        self.buffer.append(experience)
-        self.priorities.append(priority)
+        i = self.position
+        self.states[i] = self._encode(state)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = self._encode(next_state)
+        self.dones[i] = done
+        self.tree.update([i], [priority ** self.alpha])
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Add many transitions at max priority, e.g. one step of a VectorFinanceEnv"""
+        n = len(actions)
+        if n == 0:
+            return
+        if n > self.capacity:
+            # Only the last capacity transitions would survive anyway
+            states, actions, rewards = states[-self.capacity:], actions[-self.capacity:], rewards[-self.capacity:]
+            next_states, dones = next_states[-self.capacity:], dones[-self.capacity:]
+            n = self.capacity
+        slots = (self.position + np.arange(n)) % self.capacity
+        self.states[slots] = self._encode(states)
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.next_states[slots] = self._encode(next_states)
+        self.dones[slots] = dones
+        self.tree.update(slots, np.full(n, self.max_priority ** self.alpha))
+        self.position = (self.position + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
 
     def sample(self, batch_size):
-        total_priority = sum(p ** self.alpha for p in self.priorities)
-        probs = [p ** self.alpha / total_priority for p in self.priorities]
-        
+        """((states, actions, rewards, next_states, dones), indices, weights) for a batch"""
+        total_priority = self.tree.total()
+
         # Sample indices based on priorities
-        indices = np.random.choice(len(self.buffer), batch_size, p=probs)
-        
+        targets = np.random.random(batch_size) * total_priority
+        indices = self.tree.find(targets)
+        # Guard against float round-off walking past the last stored slot
+        indices = np.minimum(indices, self.size - 1)
+        probs = self.tree.get(indices) / total_priority
+
         # Calculate importance sampling weights
-        weights = [(len(self.buffer) * probs[i]) ** (-self.beta) for i in indices]
-        weights = np.array(weights) / max(weights)
-        
-        experiences = [self.buffer[i] for i in indices]
-        return experiences, indices, weights
+        weights = (self.size * probs) ** (-self.beta)
+        weights = weights / weights.max()
+
+        batch = (
+            self._decode(self.states[indices]),
+            self.actions[indices].astype(np.int64),
+            self.rewards[indices].astype(np.float64),
+            self._decode(self.next_states[indices]),
+            self.dones[indices]
+        )
+        return batch, indices, weights
 
     def update_priorities(self, indices, errors):
-        for idx, error in zip(indices, errors):
-            self.priorities[idx] = min(error + 1e-5, self.max_priority)
-            self.max_priority = max(self.max_priority, self.priorities[idx])
+        priorities = np.minimum(np.asarray(errors, dtype=np.float64) + 1e-5, self.max_priority)
+        self.tree.update(indices, priorities ** self.alpha)
+        self.max_priority = max(self.max_priority, priorities.max())
 
 class QLearningAgent:
-    def __init__(self, env, alpha=0.1, gamma=0.9, epsilon=0.2, episodes=1000):
+    def __init__(self, env, alpha=0.1, gamma=0.9, epsilon=0.2, episodes=1000, model_dir="model", verbose=True):
         self.env = env
         self.alpha = alpha      # learning rate
         self.gamma = gamma      # discount factor
         self.epsilon = epsilon  # exploration rate
         self.episodes = episodes
-        self.q_table = {}
+        self.model_dir = model_dir  # where best_q_table.pkl and q_table.pkl are written
+        self.verbose = verbose
+        self.checkpoint_interval = 5.0  # minimum seconds between best-model writes
+        # Per-episode JSONL training log (None to disable); see telemetry.py
+        self.telemetry_path = os.path.join(model_dir, "training_log.jsonl")
+        self.q_table = QTable(env.action_space.n)
         
         # Enhanced learning parameters
         self.learning_rate_decay = 0.995
@@ -53,53 +184,47 @@ class QLearningAgent:
         self.min_alpha = 0.01
         
         # Experience replay
-        self.replay_buffer = PrioritizedReplayBuffer()
+        # Observations are stored quantized: lossless for get_state_key's two decimals
+        self.replay_buffer = PrioritizedReplayBuffer(state_dim=env.observation_space.shape[0], quantize=True)
         self.batch_size = 32
         self.replay_start_size = 1000
         
-        # Double Q-learning
-        self.q_table_target = {}
+        # Double Q-learning (target values live in self.q_table.target_values)
         self.target_update_frequency = 10
         self.steps = 0
 
     def get_state_key(self, state):
-        # Discretize state space for better generalization
-        return tuple((state * 100).astype(int))
+        # Discretize state space for better generalization, packed into one int
+        return pack_state_key((state * 100).tolist())
+
+    def get_state_keys(self, states):
+        """Discretize a batch of states, one int64 key per row"""
+        return pack_state_keys(states * 100)
 
     def choose_action(self, state):
-        key = self.get_state_key(state)
-        if key not in self.q_table:
-            self.q_table[key] = np.zeros(self.env.action_space.n)
-            self.q_table_target[key] = np.zeros(self.env.action_space.n)
+        row = self.q_table.row(self.get_state_key(state))
 
         # Epsilon-greedy strategy with decay
         if np.random.random() < self.epsilon:
             return self.env.action_space.sample()
-        return np.argmax(self.q_table[key])
+        return np.argmax(self.q_table.values[row])
 
     def learn(self, state, action, reward, next_state, done):
-        key = self.get_state_key(state)
-        next_key = self.get_state_key(next_state)
-
-        if key not in self.q_table:
-            self.q_table[key] = np.zeros(self.env.action_space.n)
-            self.q_table_target[key] = np.zeros(self.env.action_space.n)
-        if next_key not in self.q_table:
-            self.q_table[next_key] = np.zeros(self.env.action_space.n)
-            self.q_table_target[next_key] = np.zeros(self.env.action_space.n)
+        self.q_table.row(self.get_state_key(state))
+        self.q_table.row(self.get_state_key(next_state))
 
         # Store experience in replay buffer
         experience = (state, action, reward, next_state, done)
         self.replay_buffer.add(experience)
 
         # Update Q-table using experience replay
-        if len(self.replay_buffer.buffer) >= self.replay_start_size:
+        if len(self.replay_buffer) >= self.replay_start_size:
             self._update_from_replay()
 
         # Update target network periodically
         self.steps += 1
         if self.steps % self.target_update_frequency == 0:
-            self.q_table_target = self.q_table.copy()
+            self.q_table.sync_target()
 
         # Update learning parameters
         self.alpha = max(self.min_alpha, self.alpha * self.learning_rate_decay)
@@ -107,70 +232,140 @@ class QLearningAgent:
 
     def _update_from_replay(self):
         # Sample from replay buffer
-        experiences, indices, weights = self.replay_buffer.sample(self.batch_size)
-        
-        # Calculate TD errors for each experience
-        td_errors = []
-        for exp, weight in zip(experiences, weights):
-            state, action, reward, next_state, done = exp
-            key = self.get_state_key(state)
-            next_key = self.get_state_key(next_state)
-            
-            # Double Q-learning update
-            if done:
-                target = reward
-            else:
-                next_action = np.argmax(self.q_table[next_key])
-                target = reward + self.gamma * self.q_table_target[next_key][next_action]
-            
-            current_q = self.q_table[key][action]
-            td_error = abs(target - current_q)
-            td_errors.append(td_error)
-            
-            # Update Q-value with importance sampling weight
-            self.q_table[key][action] += self.alpha * weight * (target - current_q)
-        
+        (states, actions, rewards, next_states, dones), indices, weights = self.replay_buffer.sample(self.batch_size)
+
+        # Discretize the whole batch at once
+        rows = self.q_table.rows(self.get_state_keys(states))
+        next_rows = self.q_table.rows(self.get_state_keys(next_states))
+
+        # Double Q-learning targets: online table picks, target table evaluates
+        next_actions = np.argmax(self.q_table.values[next_rows], axis=1)
+        next_q = self.q_table.target_values[next_rows, next_actions]
+        targets = np.where(dones, rewards, rewards + self.gamma * next_q)
+
+        current_q = self.q_table.values[rows, actions]
+        td = targets - current_q
+
+        # Update Q-values with importance sampling weights.  Repeated
+        # (state, action) pairs in the batch are averaged: np.add.at gathers
+        # every duplicate, and dividing by the count keeps the step size at
+        # alpha no matter how large the batch is.
+        flat = rows * self.q_table.n_actions + actions
+        pairs, inverse = np.unique(flat, return_inverse=True)
+        delta = np.zeros(len(pairs))
+        np.add.at(delta, inverse, self.alpha * weights * td)
+        delta /= np.bincount(inverse)
+        pair_rows, pair_actions = np.divmod(pairs, self.q_table.n_actions)
+        self.q_table.values[pair_rows, pair_actions] += delta
+
         # Update priorities in replay buffer
-        self.replay_buffer.update_priorities(indices, td_errors)
+        self.replay_buffer.update_priorities(indices, np.abs(td))
 
     def train(self):
+        os.makedirs(self.model_dir, exist_ok=True)
         best_reward = float('-inf')
         rewards_history = []
         episode_rewards = []
 
-        for episode in range(self.episodes):
-            state = self.env.reset()
-            episode_reward = 0
-            done = False
-
-            while not done:
-                action = self.choose_action(state)
-                next_state, reward, done, _ = self.env.step(action)
-                self.learn(state, action, reward, next_state, done)
-                state = next_state
-                episode_reward += reward
-
-            rewards_history.append(episode_reward)
-            episode_rewards.append(episode_reward)
-            
-            # Save best model
-            if episode_reward > best_reward:
-                best_reward = episode_reward
-                with open("model/best_q_table.pkl", "wb") as f:
-                    pickle.dump(self.q_table, f)
-
-            # Print progress
-            if (episode + 1) % 100 == 0:
-                avg_reward = np.mean(rewards_history[-100:])
-                print(f"Episode {episode + 1}/{self.episodes}")
-                print(f"Average Reward (last 100): {avg_reward:.2f}")
-                print(f"Epsilon: {self.epsilon:.3f}, Alpha: {self.alpha:.3f}")
-                print(f"Replay Buffer Size: {len(self.replay_buffer.buffer)}")
+        # Best models are written in the background, at most every checkpoint_interval seconds
+        best_writer = CheckpointWriter(
+            os.path.join(self.model_dir, "best_q_table.pkl"), min_interval=self.checkpoint_interval
+        )
+        telemetry = TelemetryWriter(self.telemetry_path) if self.telemetry_path else None
+        if telemetry:
+            telemetry.write({
+                "event": "start", "time": time.time(), "episodes": self.episodes,
+                "alpha": self.alpha, "gamma": self.gamma, "epsilon": self.epsilon,
+                "batch_size": self.batch_size, "replay_capacity": self.replay_buffer.capacity
+            })
+        clock = time.perf_counter
+        training_started = clock()
+        training_failed = True
+        try:
+            for episode in range(self.episodes):
+                episode_started = clock()
+                env_seconds = learn_seconds = checkpoint_seconds = 0.0
+                state = self.env.reset()
+                episode_reward = 0
+                steps = 0
+                done = False
+
+                while not done:
+                    t0 = clock()
+                    action = self.choose_action(state)
+                    t1 = clock()
+                    next_state, reward, done, _ = self.env.step(action)
+                    t2 = clock()
+                    self.learn(state, action, reward, next_state, done)
+                    t3 = clock()
+                    env_seconds += t2 - t1
+                    learn_seconds += (t1 - t0) + (t3 - t2)
+                    state = next_state
+                    episode_reward += reward
+                    steps += 1
+
+                rewards_history.append(episode_reward)
+                episode_rewards.append(episode_reward)
+
+                # Save best model (a snapshot, so learning can carry on while it is written)
+                if episode_reward > best_reward:
+                    best_reward = episode_reward
+                    t0 = clock()
+                    best_writer.submit(self.q_table.snapshot())
+                    checkpoint_seconds = clock() - t0
+
+                if telemetry:
+                    seconds = clock() - episode_started
+                    telemetry.write({
+                        "event": "episode",
+                        "episode": episode,
+                        "reward": float(episode_reward),
+                        "best_reward": float(best_reward),
+                        "steps": steps,
+                        "seconds": seconds,
+                        "steps_per_sec": steps / seconds if seconds > 0 else 0.0,
+                        "epsilon": self.epsilon,
+                        "alpha": self.alpha,
+                        "replay_size": len(self.replay_buffer),
+                        "q_table_size": len(self.q_table),
+                        "env_seconds": env_seconds,
+                        "learn_seconds": learn_seconds,
+                        "checkpoint_seconds": checkpoint_seconds
+                    })
+
+                # Print progress
+                if self.verbose and (episode + 1) % 100 == 0:
+                    avg_reward = np.mean(rewards_history[-100:])
+                    print(f"Episode {episode + 1}/{self.episodes}")
+                    print(f"Average Reward (last 100): {avg_reward:.2f}")
+                    print(f"Epsilon: {self.epsilon:.3f}, Alpha: {self.alpha:.3f}")
+                    print(f"Replay Buffer Size: {len(self.replay_buffer)}")
+            training_failed = False
+        finally:
+            # Close both writers even if one fails: the checkpoint writer writes
+            # the last best model still pending, the telemetry log its buffered
+            # records.  If closing fails while an exception from training is
+            # propagating, keep the original.
+            try:
+                try:
+                    best_writer.close()
+                finally:
+                    if telemetry:
+                        try:
+                            telemetry.write({
+                                "event": "end", "time": time.time(), "seconds": clock() - training_started,
+                                "episodes_completed": len(rewards_history), "checkpoints": best_writer.stats()
+                            })
+                        finally:
+                            telemetry.close()
+            except Exception:
+                if not training_failed:
+                    raise
 
         # Save final model
-        with open("model/q_table.pkl", "wb") as f:
-            pickle.dump(self.q_table, f)
-        print("✅ Training complete. Q-table saved.")
+        atomic_pickle(self.q_table, os.path.join(self.model_dir, "q_table.pkl"))
+        if self.verbose:
+            print("✅ Training complete. Q-table saved.")
         
         return rewards_history
 
@@ -180,3 +375,12 @@ class QLearningAgent:
         if key not in self.q_table:
             return np.random.choice(self.env.action_space.n)
         return np.argmax(self.q_table[key])
+
+    def get_recommendations(self, states):
+        """Get the best action for each row of a batch of states"""
+        rows = self.q_table.get_rows(self.get_state_keys(states))
+        known = rows >= 0
+        actions = np.random.randint(self.env.action_space.n, size=len(rows))
+        if known.any():
+            actions[known] = np.argmax(self.q_table.values[rows[known]], axis=1)
+        return actions
@@ -0,0 +1,309 @@
+import os
+import struct
+import tempfile
+import numpy as np
+
+# State keys pack the discretized observation, trunc(state * 100), into a
+# single int64: dimension i is stored in bits 8*i .. 8*i+7 as value + 128.
+# Values outside [-128, 127] saturate (NaN packs as 0), which loses nothing
+# for observations inside the env's [0, 1] box; rl_agent clamps user states
+# to that box before looking them up.
+STATE_KEY_DIMS = 8
+STATE_KEY_BIAS = 128
+
+# Binary model file (.qtb): a 64-byte header, then the state keys as an
+# (n_rows, key_width) int64 matrix sorted lexicographically, then the
+# matching (n_rows, n_actions) float32 Q-values.  All little-endian.
+# Packed keys have key_width 1; files written before keys were packed
+# hold one column per dimension (key_width 8) and are still readable.
+QTB_MAGIC = b"QTBL"
+QTB_VERSION = 1
+QTB_HEADER = struct.Struct("<4sIQII")  # magic, version, n_rows, key_width, n_actions
+QTB_HEADER_SIZE = 64
+
+def pack_state_key(values):
+    """Packed key of one state's scaled values, truncated to ints, as a Python int"""
+    # Plain Python: cheaper than NumPy's per-call overhead for 8 values
+    key = 0
+    shift = 0
+    for value in values:
+        if value != value:  # NaN
+            value = 0
+        elif value >= STATE_KEY_BIAS:  # also +inf, which int() rejects
+            value = STATE_KEY_BIAS - 1
+        elif value <= -STATE_KEY_BIAS - 1:
+            value = -STATE_KEY_BIAS
+        else:
+            value = int(value)
+        key |= (value + STATE_KEY_BIAS) << shift
+        shift += 8
+    return key - (1 << 64) if key >= 1 << 63 else key  # as a signed int64
+
+def pack_state_keys(values):
+    """Packed int64 key of each row of an (n, 8) matrix of scaled values, truncated to ints"""
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        # Same as pack_state_key: clipping to +-(bias - 0.5) first saturates
+        # infinities and truncates to the same ints as clipping afterwards
+        values = np.minimum(np.maximum(values, -STATE_KEY_BIAS - 0.5), STATE_KEY_BIAS - 0.5)
+        values[values != values] = 0  # NaN
+        fields = values.astype(np.int16) + STATE_KEY_BIAS
+    else:
+        # np.minimum/np.maximum: np.clip has a much higher fixed cost
+        fields = np.minimum(np.maximum(values, -STATE_KEY_BIAS), STATE_KEY_BIAS - 1) + STATE_KEY_BIAS
+    # Eight uint8 fields are exactly the bytes of one little-endian int64
+    return np.ascontiguousarray(fields, dtype=np.uint8).view("<i8")[..., 0]
+
+def unpack_state_keys(keys):
+    """(n, 8) matrix of the discretized values packed into each key"""
+    fields = np.ascontiguousarray(keys, dtype="<i8").reshape(-1, 1).view(np.uint8)
+    return fields.astype(np.int64) - STATE_KEY_BIAS
+
+def _legacy_keys(keys):
+    """Pack a list of tuple keys from before keys were packed; ints pass through"""
+    if keys and isinstance(keys[0], tuple):
+        return pack_state_keys(np.array(keys, dtype=np.int64))
+    return np.array(keys, dtype=np.int64)
+
+def _group_mean(matrix, groups, counts):
+    total = np.zeros((len(counts), matrix.shape[1]), dtype=np.float64)
+    np.add.at(total, groups, matrix)
+    return (total / counts).astype(np.float32)
+
+class QTable:
+    """Dense Q-table: one float32 matrix of Q-values plus a state key -> row index.
+
+    Rows are allocated in chunks as new states are seen.  A second matrix of
+    the same shape holds the target Q-values used for Double Q-learning, so
+    syncing the target is a single array copy.
+    """
+    def __init__(self, n_actions, chunk_size=1024):
+        self.n_actions = n_actions
+        self.chunk_size = chunk_size
+        self.index = {}
+        self.keys = []
+        self.values = np.zeros((chunk_size, n_actions), dtype=np.float32)
+        self.target_values = np.zeros((chunk_size, n_actions), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __getitem__(self, key):
+        """Q-values for a known state, as a writable view"""
+        return self.values[self.index[key]]
+
+    def _grow(self):
+        capacity = len(self.values)
+        new_capacity = capacity + max(self.chunk_size, capacity // 2)
+        for name in ("values", "target_values"):
+            old = getattr(self, name)
+            new = np.zeros((new_capacity, self.n_actions), dtype=np.float32)
+            new[:capacity] = old
+            setattr(self, name, new)
+
+    def row(self, key):
+        """Row index for a state, allocating a zeroed row if it is new"""
+        row = self.index.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.values):
+                self._grow()
+            self.index[key] = row
+            self.keys.append(key)
+        return row
+
+    def rows(self, keys):
+        """Row indices for many states, allocating rows for new ones"""
+        # Plain ints hash faster than NumPy scalars
+        return np.array([self.row(key) for key in np.asarray(keys).tolist()], dtype=np.int64)
+
+    def get_rows(self, keys):
+        """Row indices for many states, -1 where the state is unknown"""
+        index = self.index
+        return np.array([index.get(key, -1) for key in np.asarray(keys).tolist()], dtype=np.int64)
+
+    def target(self, key):
+        """Target Q-values for a known state"""
+        return self.target_values[self.index[key]]
+
+    def sync_target(self):
+        """Copy the online Q-values into the target table"""
+        np.copyto(self.target_values, self.values)
+
+    def snapshot(self):
+        """Independent copy of the rows in use, e.g. to checkpoint while training continues"""
+        table = QTable.__new__(QTable)
+        table.__setstate__(self.__getstate__())
+        table.index = dict(self.index)
+        table.keys = list(self.keys)
+        return table
+
+    def to_dict(self):
+        return {key: self.values[row].copy() for key, row in self.index.items()}
+
+    @classmethod
+    def from_dict(cls, q_dict, n_actions):
+        """Build a table from the legacy {state_key: ndarray} format"""
+        keys = _legacy_keys(list(q_dict))
+        values = np.array(list(q_dict.values()), dtype=np.float32).reshape(len(keys), n_actions)
+        table = cls.from_arrays(keys, values)
+        table.sync_target()
+        return table
+
+    @classmethod
+    def from_arrays(cls, keys, values, target_values=None, chunk_size=1024):
+        """Build a table from packed keys and their Q-values.
+
+        States that share a key (tuple keys that saturate to the same packed
+        key) are merged into one row holding their mean Q-values.
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32)
+        unique, inverse = np.unique(keys, return_inverse=True)
+        if len(unique) < len(keys):
+            counts = np.bincount(inverse)[:, None]
+            keys = unique
+            values, target_values = [
+                None if matrix is None else _group_mean(matrix, inverse, counts)
+                for matrix in (values, target_values)
+            ]
+
+        n = len(keys)
+        table = cls(values.shape[1], chunk_size)
+        table.keys = keys.tolist()
+        table.index = dict(zip(table.keys, range(n)))
+        capacity = max(chunk_size, n)
+        table.values = np.zeros((capacity, table.n_actions), dtype=np.float32)
+        table.values[:n] = values
+        table.target_values = np.zeros_like(table.values)
+        if target_values is not None:
+            table.target_values[:n] = target_values
+        return table
+
+    def save_binary(self, path):
+        """Write the online Q-values in the .qtb format (see FrozenQTable)"""
+        n = len(self.keys)
+        keys = np.asarray(self.keys, dtype=np.int64).reshape(n, -1)
+        key_width = keys.shape[1] if n else 0
+        # np.lexsort sorts by its last key first, so pass the columns reversed
+        order = np.lexsort(keys.T[::-1]) if key_width else np.arange(n)
+        header = QTB_HEADER.pack(QTB_MAGIC, QTB_VERSION, n, key_width, self.n_actions)
+
+        directory = os.path.dirname(path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header.ljust(QTB_HEADER_SIZE, b"\0"))
+                f.write(np.ascontiguousarray(keys[order], dtype="<i8").tobytes())
+                f.write(np.ascontiguousarray(self.values[:n][order], dtype="<f4").tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def __getstate__(self):
+        # Only pickle the rows in use
+        state = self.__dict__.copy()
+        n = len(self.keys)
+        state["values"] = self.values[:n].copy()
+        state["target_values"] = self.target_values[:n].copy()
+        return state
+
+    def __setstate__(self, state):
+        if state["keys"] and isinstance(state["keys"][0], tuple):
+            # Pickled before state keys were packed
+            legacy = QTable.from_arrays(
+                _legacy_keys(state["keys"]), state["values"], state["target_values"], state["chunk_size"]
+            )
+            self.__dict__.update(legacy.__dict__)
+            return
+        self.__dict__.update(state)
+        n = len(self.keys)
+        capacity = max(self.chunk_size, n)
+        for name in ("values", "target_values"):
+            array = np.zeros((capacity, self.n_actions), dtype=np.float32)
+            array[:n] = state[name]
+            setattr(self, name, array)
+
+class FrozenQTable:
+    """Read-only Q-table memory-mapped from a .qtb file.
+
+    Opening the file only reads the header; keys and Q-values are paged in
+    on demand and the pages are shared by every process that maps the same
+    file.  States are looked up by binary search over the sorted keys.
+    Lookups take packed state keys, also for files with unpacked keys.
+    Unlike a pickle, loading the file never executes code from it.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(QTB_HEADER_SIZE)
+        if len(header) < QTB_HEADER_SIZE:
+            raise ValueError(f"{path} is too short to be a Q-table file")
+        magic, version, n_rows, key_width, n_actions = QTB_HEADER.unpack_from(header)
+        if magic != QTB_MAGIC:
+            raise ValueError(f"{path} is not a Q-table file")
+        if version != QTB_VERSION:
+            raise ValueError(f"Unsupported Q-table file version {version} in {path}")
+
+        self.n_actions = n_actions
+        self.key_width = key_width
+        expected = QTB_HEADER_SIZE + n_rows * (key_width * 8 + n_actions * 4)
+        if os.path.getsize(path) != expected:
+            raise ValueError(f"{path} is truncated or corrupt")
+        if n_rows == 0:
+            self.keys = np.zeros((0, key_width), dtype="<i8")
+            self.values = np.zeros((0, n_actions), dtype="<f4")
+            return
+        self.keys = np.memmap(path, dtype="<i8", mode="r", offset=QTB_HEADER_SIZE, shape=(n_rows, key_width))
+        self.values = np.memmap(
+            path, dtype="<f4", mode="r",
+            offset=QTB_HEADER_SIZE + n_rows * key_width * 8, shape=(n_rows, n_actions)
+        )
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return self.get_rows([key])[0] >= 0
+
+    def __getitem__(self, key):
+        row = self.get_rows([key])[0]
+        if row < 0:
+            raise KeyError(key)
+        return self.values[row]
+
+    def _records(self, keys):
+        """View (n, key_width) keys as n records, which numpy orders lexicographically"""
+        record = np.dtype([(f"k{i}", "<i8") for i in range(self.key_width)])
+        return np.ascontiguousarray(keys, dtype="<i8").view(record).reshape(-1)
+
+    def get_rows(self, keys):
+        """Row indices for many states, -1 where the state is unknown"""
+        queries = np.asarray(keys, dtype=np.int64).reshape(-1, 1)
+        if self.key_width == STATE_KEY_DIMS:
+            queries = unpack_state_keys(queries)
+        n = len(self.keys)
+        if n == 0 or len(queries) == 0:
+            return np.full(len(queries), -1, dtype=np.int64)
+        if self.key_width == 1:
+            rows = np.searchsorted(self.keys[:, 0], queries[:, 0])
+        else:
+            rows = np.searchsorted(self._records(self.keys), self._records(queries))
+        clipped = np.minimum(rows, n - 1)
+        found = (rows < n) & np.all(self.keys[clipped] == queries, axis=1)
+        return np.where(found, clipped, -1).astype(np.int64)
+
+    def to_table(self):
+        """Mutable QTable with the same contents, e.g. to continue training"""
+        keys = np.asarray(self.keys)
+        keys = keys[:, 0] if self.key_width == 1 else pack_state_keys(keys)
+        table = QTable.from_arrays(keys, self.values)
+        table.sync_target()
+        return table
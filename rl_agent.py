@@ -2,8 +2,13 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import LabelEncoder
 import pickle
+import os
+import threading
+import time
 from finance_env import FinanceEnv
 from q_learning_agent import QLearningAgent
+from q_table import QTable, FrozenQTable
+from instrumentation import metrics
 
 # Load and preprocess data
 def load_data(filepath):
@@ -23,22 +28,171 @@ def load_data(filepath):
 
     return df, le
 
-def load_trained_agent():
+MODEL_PATH = "model/best_q_table.pkl"
+BINARY_MODEL_SUFFIX = ".qtb"
+MAX_EXPENSE = 50000  # Should match env
+EMERGENCY_FUND_TARGET = 100000
+
+# Map action to recommendation
+ACTION_MAP = {
+    0: "Save more cash",
+    1: "Invest in Stocks",
+    2: "Invest in Bonds",
+    3: "Invest in Real Estate",
+    4: "Reduce Spending",
+    5: "Build Emergency Fund"
+}
+
+ACTION_SUGGESTIONS = {
+    0: "Consider setting up an automatic savings plan to build your cash reserves.",
+    1: "Consider diversifying your stock portfolio for better risk management.",
+    2: "Bonds can provide stable returns. Consider government or corporate bonds.",
+    3: "Real estate can be a good long-term investment. Research local market trends.",
+    4: "Review your spending habits and identify areas where you can cut back.",
+    5: "Aim to build an emergency fund that covers 3-6 months of expenses."
+}
+
+def binary_model_path(path):
+    """The .qtb file converted from a .pkl model path"""
+    return os.path.splitext(path)[0] + BINARY_MODEL_SUFFIX
+
+def resolve_model_path(path=MODEL_PATH):
+    """Prefer the memory-mappable .qtb version of a model unless the .pkl is newer"""
+    if path.endswith(BINARY_MODEL_SUFFIX):
+        return path
+    binary_path = binary_model_path(path)
+    try:
+        binary_mtime = os.stat(binary_path).st_mtime_ns
+    except FileNotFoundError:
+        return path
+    try:
+        if os.stat(path).st_mtime_ns > binary_mtime:
+            return path  # retrained since the last conversion
+    except FileNotFoundError:
+        pass
+    return binary_path
+
+def load_trained_agent(path=MODEL_PATH):
     """Load the trained Q-learning agent"""
     try:
-        with open("model/best_q_table.pkl", "rb") as f:
-            q_table = pickle.load(f)
         env = FinanceEnv()
         agent = QLearningAgent(env)
+        if path.endswith(BINARY_MODEL_SUFFIX):
+            agent.q_table = FrozenQTable(path)
+            return agent
+        with open(path, "rb") as f:
+            q_table = pickle.load(f)
+        if isinstance(q_table, dict):
+            # Models saved before QTable were plain {state_key: ndarray} dicts
+            q_table = QTable.from_dict(q_table, env.action_space.n)
         agent.q_table = q_table
         return agent
     except FileNotFoundError:
         return None
 
+class ModelRegistry:
+    """Process-wide cache of the trained agent.
+
+    The model file is stat()ed on every get(); the agent is only reloaded
+    when its mtime, size or inode changes.  A converted .qtb file next to
+    the .pkl is used instead unless the .pkl is newer.  A reload builds the new agent
+    first and then swaps it in with a single assignment, so concurrent
+    callers always see either the old or the new model.  If a reload fails
+    (e.g. the file is still being written) the previous model, if any, keeps
+    serving and the failed version is remembered, so the file is only tried
+    again once it changes.
+    """
+    def __init__(self, path=MODEL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()  # so hits never wait on a reload
+        self._entry = None  # (file_version, agent)
+        self.hits = 0
+        self.misses = 0
+        self.load_errors = 0
+        self.last_load_seconds = 0.0
+        self.total_load_seconds = 0.0
+
+    def _file_version(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (path, st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def get(self):
+        """Return the current agent, or None if no model has been trained"""
+        path = resolve_model_path(self.path)
+        version = self._file_version(path)
+        entry = self._entry
+        if entry is not None and entry[0] == version:
+            with self._counter_lock:
+                self.hits += 1
+            return entry[1]
+
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry[0] == version:
+                with self._counter_lock:
+                    self.hits += 1
+                return entry[1]
+            with self._counter_lock:
+                self.misses += 1
+            if version is None:
+                self._entry = (None, None)
+                return None
+            start = time.perf_counter()
+            try:
+                agent = load_trained_agent(path)
+            except Exception:
+                # Keep serving the previous model; retry once the file changes
+                agent = entry[1] if entry is not None else None
+                self._entry = (version, agent)
+                with self._counter_lock:
+                    self.load_errors += 1
+                return agent
+            with self._counter_lock:
+                self.last_load_seconds = time.perf_counter() - start
+                self.total_load_seconds += self.last_load_seconds
+            self._entry = (version, agent)
+            return agent
+
+    def stats(self):
+        entry = self._entry
+        with self._counter_lock:
+            return {
+                "path": self.path,
+                "loaded": entry is not None and entry[1] is not None,
+                "version": entry[0] if entry is not None else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "load_errors": self.load_errors,
+                "last_load_seconds": self.last_load_seconds,
+                "total_load_seconds": self.total_load_seconds
+            }
+
+model_registry = ModelRegistry()
+
+def get_model_stats():
+    """Load-time and hit/miss counters of the shared model registry"""
+    return model_registry.stats()
+
+def clip_to_observation_space(states, space):
+    """Clamp user states to the box the agent was trained in.
+
+    Ratios such as savings / income routinely exceed 1 for real users.
+    State keys only tell values apart up to 1.27 (see
+    q_table.pack_state_keys), and no training episode visits states
+    beyond the box, so out-of-range profiles are mapped onto its edge.
+    """
+    # np.minimum/np.maximum: np.clip has a much higher fixed cost
+    return np.minimum(np.maximum(states, space.low), space.high)
+
 def get_rl_recommendation(income, expenses, savings, investments=None, emergency_fund=0, total_wealth=None):
     """Get RL-based financial recommendations"""
     try:
-        agent = load_trained_agent()
+        with metrics.stage("rl_model"):
+            agent = model_registry.get()
         if agent is None:
             return {
                 "budget_category": "N/A",
@@ -52,8 +206,8 @@ def get_rl_recommendation(income, expenses, savings, investments=None, emergency
             investments = {"Stocks": 0, "Bonds": 0, "Real Estate": 0}
         if total_wealth is None:
             total_wealth = income
-        max_expense = 50000  # Should match env
-        emergency_fund_target = 100000
+        max_expense = MAX_EXPENSE
+        emergency_fund_target = EMERGENCY_FUND_TARGET
         
         total_investments = sum(investments.values())
         risk_score = 0.5  # Placeholder, env will update
@@ -69,33 +223,13 @@ def get_rl_recommendation(income, expenses, savings, investments=None, emergency
         ])
 
         # Get action from agent
-        action = agent.get_recommendation(state)
-
-        # Map action to recommendation
-        action_map = {
-            0: "Save more cash",
-            1: "Invest in Stocks",
-            2: "Invest in Bonds",
-            3: "Invest in Real Estate",
-            4: "Reduce Spending",
-            5: "Build Emergency Fund"
-        }
+        with metrics.stage("rl_inference"):
+            action = agent.get_recommendation(clip_to_observation_space(state, agent.env.observation_space))
+
         priority_goal = get_priority_goal(action, savings, income, emergency_fund, emergency_fund_target)
         
         # Add descriptive suggestions based on action
-        suggestion = ""
-        if action == 0:
-            suggestion = "Consider setting up an automatic savings plan to build your cash reserves."
-        elif action == 1:
-            suggestion = "Consider diversifying your stock portfolio for better risk management."
-        elif action == 2:
-            suggestion = "Bonds can provide stable returns. Consider government or corporate bonds."
-        elif action == 3:
-            suggestion = "Real estate can be a good long-term investment. Research local market trends."
-        elif action == 4:
-            suggestion = "Review your spending habits and identify areas where you can cut back."
-        elif action == 5:
-            suggestion = "Aim to build an emergency fund that covers 3-6 months of expenses."
+        suggestion = ACTION_SUGGESTIONS.get(action, "")
 
         # Calculate daily spend limit if action is 'Reduce Spending'
         daily_spend_limit = 0
@@ -104,7 +238,7 @@ def get_rl_recommendation(income, expenses, savings, investments=None, emergency
             daily_spend_limit = max(0, monthly_available / 30)
 
         recommendations = {
-            "budget_category": action_map.get(action, "Balanced Budget"),
+            "budget_category": ACTION_MAP.get(action, "Balanced Budget"),
             "action": action,
             "priority_goal": priority_goal,
             "suggestion": suggestion,
@@ -138,3 +272,101 @@ def get_priority_goal(action, savings, income, emergency_fund, emergency_fund_ta
         return "Reduce Expenses"
     else:
         return "Maintain Current Strategy"
+
+BATCH_COLUMNS = ["income", "expenses", "savings", "investments", "emergency_fund", "total_wealth"]
+
+def _safe_divide(numerator, denominator, mask):
+    out = np.zeros(len(numerator))
+    np.divide(numerator, denominator, out=out, where=mask)
+    return out
+
+def build_state_matrix(income, expenses, savings, investments, emergency_fund, total_wealth):
+    """Vectorized version of the state vector built in get_rl_recommendation.
+
+    All arguments are 1-D arrays of equal length; investments is the total
+    invested amount per profile.  Returns an (N, 8) float64 matrix.
+    """
+    has_income = income != 0
+    has_wealth = total_wealth != 0
+    risk_score = 0.5  # Placeholder, env will update
+    return np.stack([
+        expenses / MAX_EXPENSE,
+        _safe_divide(savings, income, has_income),
+        _safe_divide(investments, income, has_income),
+        emergency_fund / EMERGENCY_FUND_TARGET,
+        has_income.astype(np.float64),
+        np.full(len(income), risk_score),
+        _safe_divide(total_wealth, income * 12, has_income),
+        _safe_divide(investments, total_wealth + 1e-6, has_wealth)
+    ], axis=1)
+
+def get_priority_goals(actions, savings, income, emergency_fund):
+    """Vectorized get_priority_goal"""
+    savings_ratio = _safe_divide(savings, income, income > 0)
+    emergency_ratio = emergency_fund / EMERGENCY_FUND_TARGET
+    return np.select(
+        [
+            income <= 0,
+            emergency_ratio < 0.5,
+            savings_ratio < 0.1,
+            actions == 1,
+            actions == 2,
+            actions == 3,
+            actions == 4
+        ],
+        [
+            "Increase Income",
+            "Build Emergency Fund",
+            "Increase Savings Rate",
+            "Start/Increase Stock Investments",
+            "Start/Increase Bond Investments",
+            "Consider Real Estate Investment",
+            "Reduce Expenses"
+        ],
+        default="Maintain Current Strategy"
+    )
+
+def get_rl_recommendations_batch(profiles):
+    """Get RL-based recommendations for many financial profiles at once.
+
+    profiles is a DataFrame (or dict of arrays) with an income, expenses and
+    savings column and optional investments, emergency_fund and total_wealth
+    columns (investments is the total invested amount).  Returns a DataFrame
+    aligned with the input rows holding the budget_category, action,
+    priority_goal, suggestion and daily_spend_limit for each profile.
+    """
+    agent = model_registry.get()
+    if agent is None:
+        raise RuntimeError("Model not trained yet")
+
+    profiles = pd.DataFrame(profiles)
+    income = profiles["income"].to_numpy(dtype=np.float64)
+    expenses = profiles["expenses"].to_numpy(dtype=np.float64)
+    savings = profiles["savings"].to_numpy(dtype=np.float64)
+    investments = profiles.get("investments", pd.Series(0.0, index=profiles.index)).to_numpy(dtype=np.float64)
+    emergency_fund = profiles.get("emergency_fund", pd.Series(0.0, index=profiles.index)).to_numpy(dtype=np.float64)
+    if "total_wealth" in profiles:
+        total_wealth = profiles["total_wealth"].to_numpy(dtype=np.float64)
+    else:
+        total_wealth = income.copy()
+
+    states = build_state_matrix(income, expenses, savings, investments, emergency_fund, total_wealth)
+    actions = agent.get_recommendations(clip_to_observation_space(states, agent.env.observation_space))
+
+    budget_categories = np.array([ACTION_MAP[a] for a in range(len(ACTION_MAP))], dtype=object)
+    suggestions = np.array([ACTION_SUGGESTIONS[a] for a in range(len(ACTION_SUGGESTIONS))], dtype=object)
+
+    # Daily spend limit only applies to 'Reduce Spending'
+    daily_spend_limit = np.where(
+        (actions == 4) & (income > 0),
+        np.maximum(0, (income - expenses) / 30),
+        0.0
+    )
+
+    return pd.DataFrame({
+        "budget_category": budget_categories[actions],
+        "action": actions,
+        "priority_goal": get_priority_goals(actions, savings, income, emergency_fund),
+        "suggestion": suggestions[actions],
+        "daily_spend_limit": np.round(daily_spend_limit, 2)
+    }, index=profiles.index)
@@ -0,0 +1,100 @@
+import threading
+from datetime import datetime
+
+class FinancialSnapshot:
+    """Every derived financial figure the pages need, computed once.
+
+    Monthly figures (income, expenses, net savings) cover one 'YYYY-MM'
+    month; lifetime figures cover the whole ledger.  Goal savings are split
+    into the emergency fund, the three investment types and plain savings
+    by keyword, as the RL agent expects.  A snapshot is immutable and
+    tagged with the ledger version it was read at.
+    """
+    def __init__(self, month, version, monthly_income, monthly_expenses, goal_totals,
+                 lifetime_income, lifetime_expenses, total_saved):
+        self.month = month
+        self.version = version
+
+        # Current month
+        self.monthly_income = monthly_income
+        self.monthly_expenses = monthly_expenses
+        self.net_savings = monthly_income - monthly_expenses
+
+        # Savings goals by bucket
+        self.emergency_fund = goal_totals["Emergency Fund"]
+        self.investments = {name: goal_totals[name] for name in ("Stocks", "Bonds", "Real Estate")}
+        self.goal_savings = goal_totals["Savings"]
+        self.total_wealth = (
+            self.net_savings + self.goal_savings + sum(self.investments.values()) + self.emergency_fund
+        )
+
+        # Whole ledger
+        self.lifetime_income = lifetime_income
+        self.lifetime_expenses = lifetime_expenses
+        self.total_saved = total_saved
+
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+
+    @classmethod
+    def from_ledger(cls, ledger, month, version=None):
+        if version is None:
+            version = ledger.get_version()
+        return cls(
+            month=month,
+            version=version,
+            monthly_income=ledger.get_monthly_total("income", month),
+            monthly_expenses=ledger.get_monthly_total("expenses", month),
+            goal_totals=ledger.get_goal_totals(),
+            lifetime_income=ledger.get_total("income"),
+            lifetime_expenses=ledger.get_total("expenses"),
+            total_saved=ledger.get_total_saved()
+        )
+
+    def rl_inputs(self):
+        """Keyword arguments for rl_agent.get_rl_recommendation (current month)"""
+        return {
+            "income": self.monthly_income,
+            "expenses": self.monthly_expenses,
+            "savings": self.goal_savings,
+            "investments": dict(self.investments),
+            "emergency_fund": self.emergency_fund,
+            "total_wealth": self.total_wealth
+        }
+
+    def portfolio_inputs(self):
+        """(income, expenses, savings) used by the stock and portfolio analysis"""
+        return self.lifetime_income, self.lifetime_expenses, self.total_saved
+
+    def memo(self, name, compute):
+        """Compute a value derived only from this snapshot once and reuse it"""
+        with self._memo_lock:
+            if name not in self._memo:
+                self._memo[name] = compute()
+            return self._memo[name]
+
+class SnapshotService:
+    """Hands out the FinancialSnapshot for the current month and ledger version.
+
+    get() costs one version lookup; the snapshot is only rebuilt when the
+    ledger has been written to (by any process) or the month has rolled over.
+    """
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def get(self, month=None):
+        if month is None:
+            month = datetime.now().strftime("%Y-%m")
+        version = self.ledger.get_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.month == month and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.month != month or snapshot.version != version:
+                snapshot = FinancialSnapshot.from_ledger(self.ledger, month, version)
+                self._snapshot = snapshot
+            return snapshot
@@ -3,46 +3,119 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import logging
+import threading
 import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from price_store import PriceStore, period_start, EARLIEST_DATE
+from ttl_cache import TTLCache
+from single_flight import SingleFlight
+from indicators import build_panel, compute_panel_metrics, IncrementalIndicators
+from instrumentation import metrics as instrumentation
+
+class _IndicatorEntry:
+    """An IncrementalIndicators tracker with its lock and last checkpoint time"""
+    __slots__ = ("tracker", "lock", "checkpointed_at")
 
-class StockAnalyzer:
     def __init__(self):
+        self.tracker = None
+        self.lock = threading.Lock()
+        self.checkpointed_at = 0.0
+
+    def approx_bytes(self):
+        return 256 + (self.tracker.approx_bytes() if self.tracker is not None else 0)
+
+class StockAnalyzer:
+    def __init__(self, price_store=None, offline=False, cache_max_bytes=64 * 1024 * 1024):
         self.logger = logging.getLogger(__name__)
         # Configure logging
         logging.basicConfig(level=logging.INFO)
         
-        # Cache for stock data to avoid repeated API calls
-        self.cache = {}
+        # Cache for stock data to avoid repeated API calls, bounded by memory
         self.cache_timeout = 300  # 5 minutes
+        self.cache = TTLCache(max_bytes=cache_max_bytes, ttl=self.cache_timeout)
+
+        # Persistent price history shared by all workers; with offline=True
+        # only stored (e.g. pre-seeded) bars are used and nothing is fetched
+        self.price_store = price_store if price_store is not None else PriceStore()
+        self.offline = offline
+
+        # Concurrent misses for the same symbol share one fetch
+        self.inflight = SingleFlight()
+        self.fetch_timeout = 30  # seconds a caller waits on someone else's fetch
+
+        # Streaming indicator state per symbol, checkpointed in the price store
+        # so a refresh only has to feed the bars that arrived since last time.
+        # Each entry carries its own lock, evicted together with the tracker.
+        self.indicators = TTLCache(max_bytes=8 * 1024 * 1024, ttl=24 * 3600,
+                                   sizeof=lambda entry: entry.approx_bytes())
+        self._indicator_lock = threading.Lock()  # creates entries one at a time
+        # Revisions of the current day's bar are checkpointed at most this
+        # often (seconds); a new trading day is always checkpointed
+        self.indicator_checkpoint_interval = 300
         
+    def _refresh_history(self, symbol, period):
+        """Download the bars missing from the price store for symbol"""
+        start = period_start(period)
+        start = EARLIEST_DATE if start is None else start
+        covered_from = self.price_store.covered_from(symbol)
+        # Allow a week of slack for weekends and holidays at the start of the period
+        covered = covered_from is not None and covered_from - start <= pd.Timedelta(days=7)
+        if covered and time.time() - self.price_store.last_fetched(symbol) < self.cache_timeout:
+            return  # Another worker refreshed it recently
+
+        first, last = self.price_store.date_range(symbol)
+        stock = yf.Ticker(symbol)
+        if last is None or not covered:
+            self.logger.info(f"Fetching {period} of history for {symbol}")
+            hist = stock.history(period=period)
+            self.price_store.save_history(symbol, hist)
+            # Complete from start on, even if the symbol only listed later
+            self.price_store.mark_fetched(symbol, covered_from=start)
+        else:
+            # Re-fetch the last stored bar too, it may have been a partial day
+            self.logger.info(f"Fetching bars for {symbol} since {last.date()}")
+            hist = stock.history(start=last.strftime("%Y-%m-%d"))
+            self.price_store.save_history(symbol, hist)
+            self.price_store.mark_fetched(symbol)
+
+    def _load_stock_data(self, symbol, period, cache_key):
+        """Refresh the stored history of symbol and cache the requested period"""
+        # Add .NS suffix for Indian stocks if not present
+        if not symbol.endswith('.NS') and not '.' in symbol:
+            symbol = f"{symbol}.NS"
+        
+        if not self.offline:
+            try:
+                self._refresh_history(symbol, period)
+            except Exception as e:
+                # Fall back to whatever history is already stored
+                self.logger.error(f"Error refreshing data for {symbol}: {str(e)}")
+        
+        hist = self.price_store.get_history(symbol, start=period_start(period))
+        
+        if hist.empty:
+            self.logger.warning(f"No data found for {symbol}")
+            return None
+            
+        # Cache the data
+        self.cache.set(cache_key, hist)
+        return hist
+
     def get_stock_data(self, symbol, period="1y"):
         """Fetch stock data from Yahoo Finance with improved error handling"""
         try:
             # Check cache first
             cache_key = f"{symbol}_{period}"
-            if cache_key in self.cache:
-                cached_time, cached_data = self.cache[cache_key]
-                if time.time() - cached_time < self.cache_timeout:
-                    return cached_data
-            
-            # Add .NS suffix for Indian stocks if not present
-            if not symbol.endswith('.NS') and not '.' in symbol:
-                symbol = f"{symbol}.NS"
-            
-            self.logger.info(f"Fetching data for {symbol}")
-            stock = yf.Ticker(symbol)
+            cached_data = self.cache.get(cache_key)
+            if cached_data is not None:
+                return cached_data
             
-            # Try to get historical data
-            hist = stock.history(period=period)
-            
-            if hist.empty:
-                self.logger.warning(f"No data found for {symbol}")
-                return None
-                
-            # Cache the data
-            self.cache[cache_key] = (time.time(), hist)
-            return hist
+            return self.inflight.do(
+                cache_key,
+                lambda: self._load_stock_data(symbol, period, cache_key),
+                timeout=self.fetch_timeout
+            )
             
         except Exception as e:
             self.logger.error(f"Error fetching data for {symbol}: {str(e)}")
@@ -108,6 +181,68 @@ class StockAnalyzer:
             self.logger.error(f"Error calculating metrics: {str(e)}")
             return None
 
+    def _indicator_entry(self, key):
+        with self._indicator_lock:
+            entry = self.indicators.get(key)
+            if entry is None:
+                entry = _IndicatorEntry()
+                self.indicators.set(key, entry)
+            return entry
+
+    def incremental_metrics(self, symbol, data, period="1y"):
+        """calculate_metrics via an IncrementalIndicators tracker for symbol.
+
+        Only the bars from the tracker's last date onwards are fed to it (the
+        last one replacing its possibly partial bar), so an intraday refresh
+        costs O(1) and a refresh without new data returns the memoized
+        metrics.  Without a usable checkpoint the tracker is rebuilt from the
+        full history.
+        """
+        if data is None or len(data) < 20:
+            return None
+
+        key = f"{symbol}_{period}"
+        entry = self._indicator_entry(key)
+        with entry.lock:
+            tracker = entry.tracker
+            if tracker is None:
+                state = self.price_store.load_indicator_state(key)
+                tracker = IncrementalIndicators.from_state(state) if state else None
+
+            pos = self._resume_position(tracker, data)
+            if pos is None:
+                tracker = IncrementalIndicators.from_history(data)
+                previous_date, changed = None, True
+            else:
+                previous_date, changed = tracker.last_date, False
+                new_bars = data.iloc[pos:]
+                volumes = new_bars['Volume'] if 'Volume' in new_bars.columns else [0.0] * len(new_bars)
+                dates = new_bars.index.strftime('%Y-%m-%d')
+                for date, close, volume in zip(dates, new_bars['Close'], volumes):
+                    changed = tracker.update(close, volume, date) or changed
+            entry.tracker = tracker
+            self.indicators.set(key, entry)  # re-accounts its size as it grows
+
+            if changed:
+                now = time.time()
+                new_day = tracker.last_date != previous_date
+                if new_day or now - entry.checkpointed_at >= self.indicator_checkpoint_interval:
+                    self.price_store.save_indicator_state(key, tracker.to_state())
+                    entry.checkpointed_at = now
+            return tracker.metrics()
+
+    @staticmethod
+    def _resume_position(tracker, data):
+        """Position in data of the tracker's last bar, or None if it is not there"""
+        if tracker is None or not tracker.last_date:
+            return None
+        if data.index[-1].strftime('%Y-%m-%d') == tracker.last_date:
+            return len(data) - 1  # no new day; at most the current bar was revised
+        pos = data.index.searchsorted(pd.Timestamp(tracker.last_date, tz=data.index.tz))
+        if pos < len(data) and data.index[pos].strftime('%Y-%m-%d') == tracker.last_date:
+            return pos
+        return None
+
     def generate_recommendation(self, metrics):
         """Generate stock recommendation based on metrics with improved logic"""
         if metrics is None:
@@ -223,13 +358,14 @@ class StockAnalyzer:
                 'risk_level': 'unknown'
             }
 
-    def analyze_stock(self, symbol):
+    def analyze_stock(self, symbol, include_history=True):
         """Complete stock analysis with improved error handling"""
         try:
             self.logger.info(f"Starting analysis for {symbol}")
             
             # Get stock data
-            data = self.get_stock_data(symbol)
+            with instrumentation.stage("stock_fetch"):
+                data = self.get_stock_data(symbol)
             if data is None:
                 return {
                     'symbol': symbol,
@@ -237,8 +373,13 @@ class StockAnalyzer:
                     'status': 'error'
                 }
 
-            # Calculate metrics
-            metrics = self.calculate_metrics(data)
+            # Calculate metrics, updating the streaming indicators with new bars only
+            with instrumentation.stage("stock_indicators"):
+                try:
+                    metrics = self.incremental_metrics(symbol, data)
+                except Exception as e:
+                    self.logger.error(f"Error updating indicators for {symbol}: {str(e)}")
+                    metrics = self.calculate_metrics(data)
             if metrics is None:
                 return {
                     'symbol': symbol,
@@ -247,23 +388,26 @@ class StockAnalyzer:
                 }
 
             # Generate recommendation
-            recommendation = self.generate_recommendation(metrics)
+            with instrumentation.stage("stock_recommendation"):
+                recommendation = self.generate_recommendation(metrics)
 
-            # Prepare historical data for charts
-            historical_data = {
-                'dates': data.index.strftime('%Y-%m-%d').tolist(),
-                'prices': data['Close'].round(2).tolist(),
-                'volumes': data['Volume'].tolist() if 'Volume' in data.columns else []
-            }
-
-            return {
+            result = {
                 'symbol': symbol,
                 'current_price': round(metrics['current_price'], 2),
                 'recommendation': recommendation,
-                'historical_data': historical_data,
                 'status': 'success',
                 'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
+
+            # Prepare historical data for charts
+            if include_history:
+                result['historical_data'] = {
+                    'dates': data.index.strftime('%Y-%m-%d').tolist(),
+                    'prices': data['Close'].round(2).tolist(),
+                    'volumes': data['Volume'].tolist() if 'Volume' in data.columns else []
+                }
+
+            return result
             
         except Exception as e:
             self.logger.error(f"Error in complete stock analysis for {symbol}: {str(e)}")
@@ -273,6 +417,67 @@ class StockAnalyzer:
                 'status': 'error'
             }
 
+    def analyze_many(self, symbols, max_workers=16, include_history=False):
+        """Analyze many symbols concurrently, yielding each result as soon as it is ready.
+
+        Fetches run on a bounded thread pool, so a watchlist takes roughly as
+        long as its slowest fetch rather than the sum of all of them.
+        Duplicate symbols are analyzed once.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(symbols)))
+        try:
+            futures = [executor.submit(self.analyze_stock, symbol, include_history) for symbol in symbols]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Stop queued work if the consumer goes away early
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def screen(self, symbols, max_workers=16):
+        """Analyze a whole universe of symbols with one vectorized indicator pass.
+
+        Histories are fetched on a bounded thread pool, aligned into a price
+        panel and run through compute_panel_metrics together.  Returns one
+        result per symbol, in the order given, without chart history.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as executor:
+            histories = dict(zip(symbols, executor.map(self.get_stock_data, symbols)))
+
+        available = {symbol: data for symbol, data in histories.items() if data is not None and not data.empty}
+        panel_metrics = compute_panel_metrics(*build_panel(available)) if available else pd.DataFrame()
+
+        last_updated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        results = []
+        for symbol in symbols:
+            if symbol not in available:
+                results.append({
+                    'symbol': symbol,
+                    'error': 'Unable to fetch stock data. Please check the symbol and try again.',
+                    'status': 'error'
+                })
+            elif symbol not in panel_metrics.index:
+                results.append({
+                    'symbol': symbol,
+                    'error': 'Unable to calculate metrics. Insufficient data.',
+                    'status': 'error'
+                })
+            else:
+                metrics = panel_metrics.loc[symbol].to_dict()
+                results.append({
+                    'symbol': symbol,
+                    'current_price': round(metrics['current_price'], 2),
+                    'recommendation': self.generate_recommendation(metrics),
+                    'status': 'success',
+                    'last_updated': last_updated
+                })
+        return results
+
     def get_market_status(self):
         """Get current market status"""
         try:
@@ -295,4 +500,9 @@ class StockAnalyzer:
     def clear_cache(self):
         """Clear the data cache"""
         self.cache.clear()
-        self.logger.info("Stock data cache cleared") 
\ No newline at end of file
+        self.indicators.clear()
+        self.logger.info("Stock data cache cleared")
+
+    def cache_stats(self):
+        """Size, hit/miss and eviction counters of the data cache"""
+        return self.cache.stats() 
\ No newline at end of file
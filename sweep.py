@@ -0,0 +1,214 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from finance_env import FinanceEnv
+from q_learning_agent import QLearningAgent
+
+# train_agent.main's settings, used for any hyperparameter the spec leaves out
+DEFAULT_PARAMS = {"alpha": 0.1, "gamma": 0.95, "epsilon": 0.3, "episodes": 2000}
+SMOOTHING_WINDOW = 100
+
+def grid_configs(space):
+    """Every combination of the listed values: {"alpha": [0.05, 0.1], ...}"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+def random_configs(space, trials, seed=0):
+    """trials random draws; a list is a choice, {"low", "high", "log"} a range"""
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(trials):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, dict):
+                low, high = values["low"], values["high"]
+                if isinstance(low, int) and isinstance(high, int):
+                    config[name] = rng.randint(low, high)
+                elif values.get("log"):
+                    config[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+                else:
+                    config[name] = rng.uniform(low, high)
+            else:
+                config[name] = rng.choice(values)
+        configs.append(config)
+    return configs
+
+def build_jobs(spec, seeds):
+    """Expand a sweep spec into one job per (configuration, seed)"""
+    space = spec.get("params", {})
+    unknown = set(space) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown hyperparameters: {', '.join(sorted(unknown))}")
+
+    if spec.get("search", "grid") == "grid":
+        configs = grid_configs(space)
+    else:
+        configs = random_configs(space, spec.get("trials", 10), spec.get("seed", 0))
+
+    jobs = []
+    for config_id, config in enumerate(configs):
+        params = dict(DEFAULT_PARAMS, **config)
+        for seed in seeds:
+            jobs.append({"config_id": config_id, "seed": seed, "params": params})
+    return jobs
+
+def run_job(job, output_dir):
+    """Train one agent in its own directory; runs inside a worker process"""
+    job_dir = os.path.join(output_dir, f"config_{job['config_id']:03d}_seed_{job['seed']}")
+    os.makedirs(job_dir, exist_ok=True)
+    with open(os.path.join(job_dir, "params.json"), "w") as f:
+        json.dump(job, f, indent=2)
+
+    # Exploration, replay sampling and action sampling are the only randomness
+    np.random.seed(job["seed"])
+    random.seed(job["seed"])
+    env = FinanceEnv()
+    env.action_space.seed(job["seed"])
+
+    params = job["params"]
+    agent = QLearningAgent(
+        env=env,
+        alpha=params["alpha"],
+        gamma=params["gamma"],
+        epsilon=params["epsilon"],
+        episodes=int(params["episodes"]),
+        model_dir=job_dir,
+        verbose=False
+    )
+    started = time.perf_counter()
+    rewards = agent.train()
+    elapsed = time.perf_counter() - started
+    np.savetxt(os.path.join(job_dir, "rewards.csv"), rewards, delimiter=",")
+
+    return {
+        "config_id": job["config_id"],
+        "seed": job["seed"],
+        **params,
+        "final_avg_reward": float(np.mean(rewards[-SMOOTHING_WINDOW:])),
+        "best_reward": float(np.max(rewards)),
+        "mean_reward": float(np.mean(rewards)),
+        "q_table_size": len(agent.q_table),
+        "train_seconds": elapsed,
+        "job_dir": job_dir,
+        "rewards": rewards
+    }
+
+def summarize(results):
+    """Per-job results table and a per-configuration mean/std over seeds"""
+    table = pd.DataFrame([{k: v for k, v in r.items() if k != "rewards"} for r in results])
+    table = table.sort_values(["config_id", "seed"]).reset_index(drop=True)
+    param_columns = ["config_id"] + list(DEFAULT_PARAMS)
+    summary = (
+        table.groupby(param_columns)[["final_avg_reward", "best_reward", "train_seconds"]]
+        .agg(["mean", "std"])
+    )
+    summary.columns = [f"{metric}_{stat}" for metric, stat in summary.columns]
+    summary["seeds"] = table.groupby(param_columns).size()
+    summary = summary.reset_index().sort_values("final_avg_reward_mean", ascending=False)
+    return table, summary
+
+def reward_curves(results):
+    """Episode x job matrix of rewards (shorter runs padded with NaN)"""
+    curves = {f"config_{r['config_id']:03d}_seed_{r['seed']}": pd.Series(r["rewards"]) for r in results}
+    curves = pd.DataFrame(curves).sort_index(axis=1)
+    curves.index.name = "episode"
+    return curves
+
+def plot_reward_curves(results, save_path):
+    """Seed-averaged moving-average reward of every configuration"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    by_config = {}
+    for r in results:
+        by_config.setdefault(r["config_id"], []).append(r["rewards"])
+
+    plt.figure(figsize=(10, 5))
+    for config_id, runs in sorted(by_config.items()):
+        length = min(len(run) for run in runs)
+        mean_rewards = np.mean([run[:length] for run in runs], axis=0)
+        window = min(SMOOTHING_WINDOW, length)
+        plt.plot(np.convolve(mean_rewards, np.ones(window) / window, mode='valid'),
+                 label=f"config {config_id}")
+    plt.xlabel('Episode')
+    plt.ylabel(f'Reward ({SMOOTHING_WINDOW}-episode moving average)')
+    plt.title('Sweep Training Progress')
+    if len(by_config) <= 20:
+        plt.legend(fontsize='small')
+    plt.savefig(save_path)
+    plt.close()
+
+def run_sweep(spec, seeds, output_dir, max_workers=None):
+    """Run every job of the sweep on a process pool and write the aggregated results"""
+    jobs = build_jobs(spec, seeds)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "spec.json"), "w") as f:
+        json.dump({"spec": spec, "seeds": list(seeds)}, f, indent=2)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {executor.submit(run_job, job, output_dir): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ config {job['config_id']} seed {job['seed']} failed: {e}")
+                continue
+            results.append(result)
+            print(f"✔ config {result['config_id']} seed {result['seed']}: "
+                  f"final avg reward {result['final_avg_reward']:.2f} "
+                  f"({result['train_seconds']:.1f}s) [{len(results)}/{len(jobs)}]")
+
+    if not results:
+        raise RuntimeError("Every sweep job failed")
+
+    table, summary = summarize(results)
+    table.to_csv(os.path.join(output_dir, "results.csv"), index=False)
+    summary.to_csv(os.path.join(output_dir, "summary.csv"), index=False)
+    reward_curves(results).to_csv(os.path.join(output_dir, "reward_curves.csv"))
+    plot_reward_curves(results, os.path.join(output_dir, "reward_curves.png"))
+    return table, summary
+
+def parse_param(text):
+    """'alpha=0.05,0.1' -> ('alpha', [0.05, 0.1])"""
+    name, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(f"Expected name=v1,v2,...: {text}")
+    return name, [json.loads(v) for v in values.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Train QLearningAgent over a grid or random hyperparameter search, several seeds each"
+    )
+    parser.add_argument("--spec", help='JSON file: {"search": "grid"|"random", "params": {...}, "trials": N}')
+    parser.add_argument("--param", action="append", type=parse_param, default=[],
+                        help="Grid values for one hyperparameter, e.g. alpha=0.05,0.1 (repeatable)")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument("--output", default=None, help="Output directory (default: sweeps/<timestamp>)")
+    args = parser.parse_args()
+
+    if args.spec:
+        with open(args.spec) as f:
+            spec = json.load(f)
+    else:
+        spec = {"search": "grid", "params": {}}
+    spec.setdefault("params", {}).update(dict(args.param))
+
+    output_dir = args.output or os.path.join("sweeps", datetime.now().strftime("%Y%m%d-%H%M%S"))
+    print(f"🚀 Running sweep into {output_dir}")
+    _, summary = run_sweep(spec, args.seeds, output_dir, args.workers)
+    print(summary.head(10).to_string(index=False))
+    print(f"✅ Results written to {output_dir}")
+
+if __name__ == "__main__":
+    main()
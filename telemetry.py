@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import time
+import pandas as pd
+
+# One shared encoder: json.dumps would build a new one per call with these options
+_encoder = json.JSONEncoder(separators=(",", ":"), default=float)
+
+class TelemetryWriter:
+    """Append-only JSON Lines log with bounded buffering.
+
+    Records are serialized into an in-memory buffer and appended to the
+    file in one write once buffer_size records are waiting or
+    flush_interval seconds have passed, so a training loop pays for one
+    json.dumps per record and the log stays at most a few seconds behind
+    for anyone tailing it.  Each record is one complete line, so readers
+    only ever have to skip a partially written last line.
+    """
+    def __init__(self, path, buffer_size=256, flush_interval=2.0):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self.records = 0
+
+    def write(self, record):
+        self._buffer.append(_encoder.encode(record))
+        self.records += 1
+        if len(self._buffer) >= self.buffer_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_telemetry(path, event="episode", last_run=True):
+    """Records of one event type from a telemetry log as a DataFrame.
+
+    Runs append to the same log, each starting with a "start" record; by
+    default only the records of the most recent run are returned.
+    """
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # line still being written
+            if last_run and record.get("event") == "start":
+                records = []
+            if event is None or record.get("event") == event:
+                records.append(record)
+    return pd.DataFrame(records)
+
+def summarize(path, window=100):
+    """One-screen progress report of a (possibly still running) training log"""
+    episodes = read_telemetry(path)
+    if episodes.empty:
+        return f"{path}: no episodes logged yet"
+    last = episodes.iloc[-1]
+    recent = episodes.tail(window)
+    phase_totals = recent[["env_seconds", "learn_seconds", "checkpoint_seconds"]].sum()
+    phase_share = phase_totals / max(phase_totals.sum(), 1e-12) * 100
+    return "\n".join([
+        f"Episode {int(last['episode']) + 1}: best reward {episodes['reward'].max():.2f}",
+        f"Average reward (last {len(recent)}): {recent['reward'].mean():.2f}",
+        f"Epsilon: {last['epsilon']:.3f}, Alpha: {last['alpha']:.3f}",
+        f"Replay buffer: {int(last['replay_size'])}, Q-table states: {int(last['q_table_size'])}",
+        f"Throughput: {recent['steps'].sum() / max(recent['seconds'].sum(), 1e-12):,.0f} steps/s",
+        "Time split: " + ", ".join(
+            f"{name.replace('_seconds', '')} {share:.0f}%" for name, share in phase_share.items()
+        )
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a training telemetry log")
+    parser.add_argument("path", nargs="?", default="model/training_log.jsonl")
+    parser.add_argument("--window", type=int, default=100, help="Episodes to average over")
+    parser.add_argument("--follow", type=float, metavar="SECONDS", help="Refresh every SECONDS until interrupted")
+    args = parser.parse_args()
+
+    try:
+        while True:
+            print(summarize(args.path, args.window))
+            if not args.follow:
+                break
+            time.sleep(args.follow)
+            print()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import numpy as np
+import pytest
+from finance_env import FinanceEnv, VectorFinanceEnv
+
+class ReferenceFinanceEnv:
+    """Frozen copy of FinanceEnv as it was before step() kept running totals.
+
+    Holdings live in a dict and every quantity is recomputed from scratch
+    each step; FinanceEnv must produce exactly the same observations,
+    rewards and done flags.  Do not "fix" or speed this up.
+    """
+    def __init__(self):
+        template = FinanceEnv()
+        self.income = template.income
+        self.max_expense = template.max_expense
+        self.emergency_fund_target = template.emergency_fund_target
+        self.investment_opportunities = template.investment_opportunities
+        self.reset()
+
+    def reset(self):
+        self.expenses = 0
+        self.savings = 0
+        self.investments = {
+            "Stocks": 0,
+            "Bonds": 0,
+            "Real Estate": 0
+        }
+        self.emergency_fund = 0
+        self.monthly_income = self.income
+        self.total_wealth = self.income
+        self.risk_score = 0.5
+        return self._get_state()
+
+    def _get_state(self):
+        total_investments = sum(self.investments.values())
+        return np.array([
+            self.expenses / self.max_expense,
+            self.savings / self.income,
+            total_investments / self.income,
+            self.emergency_fund / self.emergency_fund_target,
+            self.monthly_income / self.income,
+            self.risk_score,
+            self.total_wealth / (self.income * 12),
+            sum(self.investments.values()) / (self.total_wealth + 1e-6)
+        ], dtype=np.float32)
+
+    def _calculate_risk_score(self):
+        risk_score = 0
+        total_invested = sum(self.investments.values())
+        if total_invested > 0:
+            for inv_type, amount in self.investments.items():
+                weight = amount / total_invested
+                for opp in self.investment_opportunities:
+                    if opp["name"] == inv_type:
+                        risk_score += weight * opp["risk"]
+        return risk_score
+
+    def _calculate_reward(self, action):
+        base_reward = 0
+
+        emergency_ratio = self.emergency_fund / self.emergency_fund_target
+        base_reward += 2 * (1 - np.exp(-emergency_ratio))
+
+        total_investments = sum(self.investments.values())
+        if total_investments > 0:
+            diversification = 1 - sum((v/total_investments)**2 for v in self.investments.values())
+            base_reward += diversification * 2
+
+        risk_score = self._calculate_risk_score()
+        expected_return = sum(
+            self.investments[inv["name"]] * inv["return"]
+            for inv in self.investment_opportunities
+            if inv["name"] in self.investments
+        ) / (total_investments + 1e-6)
+
+        risk_adjusted_return = expected_return / (risk_score + 1e-6)
+        base_reward += risk_adjusted_return * 3
+
+        if action == 0:
+            base_reward += 1 if self.savings < self.income * 0.3 else 0.5
+        elif action == 1:
+            base_reward += 1.5 if self.investments["Stocks"] < self.income * 0.4 else 0.5
+        elif action == 2:
+            base_reward += 1.2 if self.investments["Bonds"] < self.income * 0.3 else 0.5
+        elif action == 3:
+            base_reward += 1.3 if self.investments["Real Estate"] < self.income * 0.2 else 0.5
+        elif action == 4:
+            expense_ratio = self.expenses / self.income
+            base_reward += 0.5 if expense_ratio < 0.5 else -1
+        elif action == 5:
+            base_reward += 2 if self.emergency_fund < self.emergency_fund_target else 0.5
+
+        if risk_score > 0.7:
+            base_reward -= 1
+
+        return base_reward
+
+    def step(self, action):
+        amount = 10000
+
+        if action == 0:
+            self.savings += amount
+        elif action == 1:
+            self.investments["Stocks"] += amount
+        elif action == 2:
+            self.investments["Bonds"] += amount
+        elif action == 3:
+            self.investments["Real Estate"] += amount
+        elif action == 4:
+            self.expenses += amount
+        elif action == 5:
+            self.emergency_fund += amount
+
+        self.total_wealth = (
+            self.savings +
+            sum(self.investments.values()) +
+            self.emergency_fund -
+            self.expenses
+        )
+
+        self.risk_score = self._calculate_risk_score()
+
+        reward = self._calculate_reward(action)
+
+        done = (
+            (self.expenses + self.savings + sum(self.investments.values()) + self.emergency_fund >= self.income) or
+            (self.total_wealth < self.income * 0.5)
+        )
+
+        return self._get_state(), reward, done, {}
+
+def random_action(rng):
+    """Mostly valid actions, some out of range, as NumPy or plain ints"""
+    action = rng.integers(-2, 9) if rng.random() < 0.1 else rng.integers(6)
+    return int(action) if rng.random() < 0.5 else action
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_step_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    env, reference = FinanceEnv(), ReferenceFinanceEnv()
+    steps = 0
+    while steps < 25000:
+        assert env.reset().tobytes() == reference.reset().tobytes()
+        # Half the episodes keep stepping past done, to reach large holdings
+        stop_at_done = rng.random() < 0.5
+        for _ in range(rng.integers(1, 60)):
+            action = random_action(rng)
+            state, reward, done, _ = env.step(action)
+            expected_state, expected_reward, expected_done, _ = reference.step(action)
+            steps += 1
+            assert state.tobytes() == expected_state.tobytes(), (steps, action)
+            assert reward == expected_reward and type(reward) is type(expected_reward), (steps, action)
+            assert done == expected_done, (steps, action)
+            assert env.investments == reference.investments
+            if done and stop_at_done:
+                break
+
+def test_vector_env_matches_single_envs():
+    rng = np.random.default_rng(0)
+    num_envs = 64
+    vector = VectorFinanceEnv(num_envs)
+    singles = [ReferenceFinanceEnv() for _ in range(num_envs)]
+    for _ in range(3000):
+        actions = rng.integers(6, size=num_envs)
+        states, rewards, dones, info = vector.step(actions)
+        for i, env in enumerate(singles):
+            state, reward, done, _ = env.step(actions[i])
+            assert rewards[i] == reward
+            assert dones[i] == done
+            if done:
+                assert info["final_observation"][i].tobytes() == state.tobytes()
+                assert states[i].tobytes() == env.reset().tobytes()
+            else:
+                assert states[i].tobytes() == state.tobytes()
@@ -0,0 +1,46 @@
+import numpy as np
+from q_table import QTable, pack_state_key, pack_state_keys, unpack_state_keys
+
+def random_q_dict(n_states, n_actions=6, seed=0):
+    """Legacy {state tuple: Q-values} dict of n_states distinct states"""
+    rng = np.random.default_rng(seed)
+    keys = set()
+    while len(keys) < n_states:
+        keys.add(tuple(rng.integers(0, 101, size=8).tolist()))
+    return {key: rng.normal(size=n_actions) for key in keys}
+
+def test_from_dict_loads_more_states_than_one_chunk():
+    q_dict = random_q_dict(3000)
+    table = QTable.from_dict(q_dict, 6)
+    assert len(table) == 3000
+    assert len(table.values) >= 3000
+
+    restored = QTable.from_dict(table.to_dict(), 6)
+    for key, q_values in table.to_dict().items():
+        np.testing.assert_array_equal(restored[key], q_values)
+    np.testing.assert_array_equal(table.target_values[:3000], table.values[:3000])
+
+def test_rows_grow_past_the_first_chunk():
+    table = QTable(6, chunk_size=16)
+    rows = table.rows(np.arange(100))
+    table.values[rows] = np.arange(100)[:, None]
+    assert len(table) == 100
+    assert table[99][0] == 99
+
+def test_scalar_and_vector_packing_agree():
+    rng = np.random.default_rng(0)
+    scaled = rng.uniform(-300, 300, size=(5000, 8)).astype(np.float32)
+    scaled[:10] = [np.nan, np.inf, -np.inf, 127.9, 128.0, -128.9, -129.0, -0.5]
+    keys = pack_state_keys(scaled)
+    assert keys.dtype == np.int64
+    assert [pack_state_key(row) for row in scaled.tolist()] == keys.tolist()
+
+def test_packing_is_lossless_inside_the_field_range():
+    rng = np.random.default_rng(1)
+    values = rng.integers(-128, 128, size=(5000, 8))
+    np.testing.assert_array_equal(unpack_state_keys(pack_state_keys(values)), values)
+
+def test_non_finite_values_pack_like_zero_or_the_edges():
+    (key,) = pack_state_keys(np.array([[np.nan, np.inf, -np.inf, 0, 0, 0, 0, 0]]))
+    np.testing.assert_array_equal(unpack_state_keys([key])[0], [0, 127, -128, 0, 0, 0, 0, 0])
+    assert pack_state_key([np.nan, np.inf, -np.inf, 0, 0, 0, 0, 0]) == key
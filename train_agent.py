@@ -45,6 +45,7 @@ def main():
     
     print("✅ Training complete!")
     print(f"Model saved in 'model/best_q_table.pkl'")
+    print(f"Training log in '{agent.telemetry_path}' (summarize with: python telemetry.py)")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file